@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class AlertSink:
+    """Шаг доставки оповещения: handler(alert) с ограничением по времени
+
+    handler может дописывать в словарь alert поля для следующих шагов (например, путь снимка).
+    Одновременно выполняется не больше max_in_flight вызовов: зависший шаг не копит потоки,
+    а пропускается, пока не освободится.
+    """
+
+    def __init__(self, name, handler, timeout=5.0, max_in_flight=2):
+        self.name = name
+        self.handler = handler
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"alert-{name}")
+        self._lock = threading.Lock()
+
+    def submit(self, alert):
+        """Future вызова или None, если все слоты шага заняты"""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.skipped += 1
+                return None
+            self.in_flight += 1
+        future = self._executor.submit(self.handler, alert)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {'in_flight': self.in_flight, 'timeouts': self.timeouts, 'errors': self.errors, 'skipped': self.skipped}
+
+
+class AlertPipeline:
+    """Асинхронная доставка оповещений: ограниченная очередь и фиксированный пул потоков
+
+    submit() не блокирует распознавание: при переполненной очереди оповещение отбрасывается
+    (счётчик dropped). Оповещение с тем же ключом, что уже ждёт в очереди, сливается с ним
+    (coalesced), а повтор ключа в течение dedup_window после доставки отбрасывается как
+    дубликат. Шаги (sinks) выполняются по порядку, у каждого свой таймаут.
+
+    Оповещение — словарь; ключ — (name, camera). Если в нём есть frame_ref, ссылка на кадр
+    освобождается после завершения всех шагов или при отбрасывании.
+    """
+
+    def __init__(self, sinks, workers=2, queue_size=100, dedup_window=10.0):
+        self.sinks = list(sinks)
+        self.queue_size = queue_size
+        self.dedup_window = dedup_window
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0  # Очередь переполнена
+        self.deduplicated = 0  # Повтор в течение dedup_window после доставки
+        self.coalesced = 0  # Слито с ожидающим в очереди
+        self.on_sink_time = None  # on_sink_time(имя шага, секунды): длительность шага (метрики)
+        self._queue = deque()
+        self._queued = {}  # Ключ → ожидающее оповещение
+        self._delivered_at = {}  # Ключ → время последней доставки
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, name=f"alerts-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def key(alert):
+        return alert['name'], alert['camera']
+
+    def submit(self, alert):
+        """Постановка оповещения в очередь; False — отброшено (дубликат или переполнение)"""
+        key = self.key(alert)
+        now = time.monotonic()
+        with self._cond:
+            self.submitted += 1
+            if key in self._queued:
+                self._queued[key]['count'] = self._queued[key].get('count', 1) + 1
+                self.coalesced += 1
+                accepted = None
+            elif now - self._delivered_at.get(key, -self.dedup_window) < self.dedup_window:
+                self.deduplicated += 1
+                accepted = False
+            elif len(self._queue) >= self.queue_size:
+                self.dropped += 1
+                accepted = False
+            else:
+                alert['queued_at'] = now
+                self._queue.append(alert)
+                self._queued[key] = alert
+                self._cond.notify()
+                return True
+        self._release(alert)
+        return accepted is None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                alert = self._queue.popleft()
+                key = self.key(alert)
+                del self._queued[key]
+                self._delivered_at[key] = time.monotonic()
+                self._forget_old()
+            self._deliver(alert)
+
+    def _forget_old(self):
+        if len(self._delivered_at) > 1000:
+            limit = time.monotonic() - self.dedup_window
+            for key in [key for key, at in self._delivered_at.items() if at < limit]:
+                del self._delivered_at[key]
+
+    def _deliver(self, alert):
+        running = []
+        for sink in self.sinks:
+            start = time.perf_counter()
+            future = sink.submit(alert)
+            if future is None:
+                continue
+            try:
+                future.result(timeout=sink.timeout)
+                if self.on_sink_time:
+                    self.on_sink_time(sink.name, time.perf_counter() - start)
+            except FutureTimeout:
+                sink.timeouts += 1
+                running.append(future)
+                print(f"⚠️ Шаг оповещения '{sink.name}' не уложился в {sink.timeout} с")
+            except Exception as e:
+                sink.errors += 1
+                print(f"❌ Ошибка шага оповещения '{sink.name}': {e}")
+        with self._cond:
+            self.delivered += 1
+        self._release_after(alert, running)
+
+    def _release_after(self, alert, futures):
+        # Шаги, не уложившиеся в таймаут, ещё могут читать кадр: освобождаем после них
+        if not futures:
+            self._release(alert)
+            return
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._release(alert)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    @staticmethod
+    def _release(alert):
+        frame_ref = alert.pop('frame_ref', None)
+        if frame_ref is not None:
+            frame_ref.release()
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                'queue_depth': len(self._queue),
+                'submitted': self.submitted,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'deduplicated': self.deduplicated,
+                'coalesced': self.coalesced,
+            }
+        stats['sinks'] = {sink.name: sink.stats() for sink in self.sinks}
+        return stats
@@ -0,0 +1,309 @@
+"""Бенчмарки системы распознавания лиц
+
+    python benchmark.py index --gallery 100000 --queries 2000 --nprobe 1 4 8 16
+    python benchmark.py pipeline video.mp4 --gallery 100000 --output run.json
+    python benchmark.py pipeline frames/ --fps 10 --realtime --baseline run.json
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from face_gallery import ENCODING_DIM
+from face_index import ExactIndex, IVFIndex
+
+
+def synthetic_gallery(size, seed=0, identity_spread=0.35):
+    """Синтетическая галерея, похожая на реальные encodings dlib: точки вокруг центра, разброс ~0.35"""
+    rng = np.random.default_rng(seed)
+    center = rng.normal(0.0, 0.1, ENCODING_DIM)
+    gallery = center + rng.normal(0.0, identity_spread / np.sqrt(ENCODING_DIM), (size, ENCODING_DIM))
+    return gallery.astype(np.float32)
+
+
+def synthetic_queries(gallery, count, noise=0.25, seed=1):
+    """Запросы — зашумлённые копии случайных лиц галереи (новое фото того же человека)"""
+    rng = np.random.default_rng(seed)
+    targets = rng.integers(0, len(gallery), count)
+    queries = gallery[targets] + rng.normal(0.0, noise / np.sqrt(ENCODING_DIM), (count, ENCODING_DIM))
+    return queries.astype(np.float32), targets
+
+
+def _timed_search(index, queries, batch):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        results.append(index.search(queries[i:i + batch], 1)[0][:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(results), len(queries) / elapsed
+
+
+def bench_index(args):
+    gallery = synthetic_gallery(args.gallery, seed=args.seed)
+    queries, _ = synthetic_queries(gallery, args.queries, noise=args.noise, seed=args.seed + 1)
+    print(f"Галерея: {len(gallery)} лиц, запросов: {len(queries)}, батч: {args.batch}")
+
+    exact = ExactIndex()
+    exact.build(gallery)
+    truth, exact_qps = _timed_search(exact, queries, args.batch)
+    report = {'gallery': len(gallery), 'queries': len(queries), 'batch': args.batch,
+              'exact': {'qps': exact_qps}, 'ivf': []}
+    print(f"exact            recall@1=1.0000  {exact_qps:10.1f} запросов/с")
+
+    ivf = IVFIndex(nlist=args.nlist, seed=args.seed)
+    start = time.perf_counter()
+    ivf.build(gallery)
+    build_time = time.perf_counter() - start
+    report['ivf_build_sec'] = build_time
+    print(f"ivf: построение {build_time:.2f} с, списков: {len(ivf.centroids)}")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, qps = _timed_search(ivf, queries, args.batch)
+        recall = float(np.mean(found == truth))
+        report['ivf'].append({'nprobe': nprobe, 'recall_at_1': recall, 'qps': qps})
+        print(f"ivf nprobe={nprobe:<4}  recall@1={recall:.4f}  {qps:10.1f} запросов/с  (x{qps / exact_qps:.1f})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Результаты сохранены: {args.output}")
+
+
+STAGES = ('decode', 'motion', 'resize', 'detect', 'encode', 'match', 'alert')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def image_files(source):
+    """Кадры последовательности изображений: каталог или маска ("frames/*.jpg"), по имени файла"""
+    pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+    return sorted(path for path in glob.glob(pattern) if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_frames(source, ring, max_frames=0):
+    """Кадры видеофайла или последовательности изображений: (FrameRef, время декодирования)
+
+    Кадры видео декодируются прямо в слот кольца, как при захвате с камеры.
+    """
+    count = 0
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise RuntimeError(f"Не удалось открыть видео: {source}")
+        shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        try:
+            while not max_frames or count < max_frames:
+                start = time.perf_counter()
+                frame_ref = ring.acquire(shape)
+                ret, frame = cap.read(frame_ref.frame)
+                if not ret:
+                    frame_ref.release()
+                    return
+                if frame is not frame_ref.frame:
+                    frame_ref.release()
+                    frame_ref = ring.wrap(frame)
+                count += 1
+                yield frame_ref, time.perf_counter() - start
+        finally:
+            cap.release()
+        return
+
+    paths = image_files(source)
+    if not paths:
+        raise RuntimeError(f"Нет кадров: {source}")
+    for path in paths[:max_frames or None]:
+        start = time.perf_counter()
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"⚠️ Не удалось прочитать {path}")
+            continue
+        yield ring.wrap(frame), time.perf_counter() - start
+
+
+def source_fps(source, default):
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        cap = cv2.VideoCapture(source)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        if fps and fps > 0:
+            return fps
+    return default
+
+
+def percentiles(values):
+    """Сводка по замерам в миллисекундах: среднее, p50, p99, максимум"""
+    if not values:
+        return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    ms = np.asarray(values) * 1000
+    return {
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def plant_faces(system, frt, source, frames):
+    """Encodings лиц с первых кадров записи, добавляемые в галерею (чтобы сработали совпадения и оповещения)"""
+    from detection import detect_faces, encode_faces
+
+    encodings = []
+    for frame_ref, _ in read_frames(source, system.frame_ring, frames):
+        with frame_ref:
+            detections = detect_faces(frame_ref.frame, [(0, frame_ref.shape[1], frame_ref.shape[0], 0)],
+                                      scale=frt.DETECTION_SCALE)
+            encodings.extend(encode_faces(detections))
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+
+def bench_pipeline(args):
+    source = os.path.abspath(args.source)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # Система пишет базу, журнал и снимки по относительным путям: во временный каталог
+    workdir = tempfile.mkdtemp(prefix="facewatch-bench-")
+    os.chdir(workdir)
+    import face_recognition_trassir as frt
+
+    frt.EXECUTION_MODE = args.mode
+    frt.MOTION_GATING = not args.no_motion
+    frt.INDEX_TYPE = args.index
+    frt.IVF_NPROBE = args.nprobe
+    frt.TTS_ENGINE = "silent"  # Синтез речи не нужен и не должен ходить в сеть
+    frt.init_services()
+    system = frt.FaceRecognitionSystem()
+
+    gallery = synthetic_gallery(args.gallery, seed=args.seed)
+    names = [f"person_{i}" for i in range(len(gallery))]
+    if args.plant:
+        planted = plant_faces(system, frt, source, args.plant)
+        gallery = np.concatenate([gallery, planted])
+        names += [f"planted_{i}" for i in range(len(planted))]
+        print(f"🧪 В галерею добавлено лиц из записи: {len(planted)}")
+    start = time.perf_counter()
+    system.gallery = frt.create_gallery(gallery, names)
+    build_time = time.perf_counter() - start
+    print(f"👥 Галерея: {len(system.gallery)} лиц, индекс: {args.index}, построение {build_time:.2f} с")
+
+    fps = source_fps(source, args.fps)
+    interval = 1.0 / fps if args.realtime else 0.0
+    stages = {stage: [] for stage in STAGES}
+    latencies = []
+    faces = 0
+    print(f"▶️ {source}: режим {args.mode}, {'темп записи ' + format(fps, '.1f') + ' к/с' if args.realtime else 'максимальная скорость'}")
+
+    started = time.perf_counter()
+    next_frame = started
+    try:
+        for frame_ref, decode_time in read_frames(source, system.frame_ring, args.frames):
+            with frame_ref:
+                timings = {'decode': decode_time}
+                start = time.perf_counter()
+                system.process_frame(frame_ref, timings=timings)
+                latencies.append(time.perf_counter() - start)
+                faces += system.camera(frt.CAMERAS[0]["id"]).face_count
+                for stage in STAGES:
+                    stages[stage].append(timings.get(stage, 0.0))
+            if interval:
+                next_frame += interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+        elapsed = time.perf_counter() - started
+    finally:
+        if system.process_backend:
+            system.process_backend.stop()
+        system.frame_ring.close()
+
+    frames = len(latencies)
+    if not frames:
+        raise RuntimeError("Не обработано ни одного кадра")
+    report = {
+        'source': source,
+        'mode': args.mode,
+        'realtime': args.realtime,
+        'motion_gating': not args.no_motion,
+        'gallery': len(system.gallery),
+        'index': args.index,
+        'frames': frames,
+        'faces': faces,
+        'elapsed_sec': round(elapsed, 3),
+        'frames_per_sec': round(frames / elapsed, 2),
+        'faces_per_sec': round(faces / elapsed, 2),
+        'latency': percentiles(latencies),
+        'stages': {stage: percentiles(values) for stage, values in stages.items()},
+        'alerts': system.alerts.stats(),
+    }
+
+    print(f"Кадров: {frames}, лиц: {faces}, {report['frames_per_sec']} к/с, {report['faces_per_sec']} лиц/с")
+    latency = report['latency']
+    print(f"Задержка кадра: p50 {latency['p50_ms']} мс, p99 {latency['p99_ms']} мс, макс. {latency['max_ms']} мс")
+    for stage, stats in report['stages'].items():
+        print(f"  {stage:<7} среднее {stats['mean_ms']:9.3f} мс  p50 {stats['p50_ms']:9.3f} мс  p99 {stats['p99_ms']:9.3f} мс")
+    print(f"Оповещений: {report['alerts']['submitted']}")
+
+    if baseline:
+        compare_reports(baseline, report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Результаты сохранены: {output}")
+
+
+def compare_reports(path, report):
+    """Сравнение с сохранённым прогоном: изменение пропускной способности и задержек"""
+    with open(path) as f:
+        base = json.load(f)
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "—"
+
+    print(f"Сравнение с {path}:")
+    print(f"  к/с        {base['frames_per_sec']:>10} → {report['frames_per_sec']:<10} {change(report['frames_per_sec'], base['frames_per_sec'])}")
+    for key in ('p50_ms', 'p99_ms'):
+        old, new = base['latency'][key], report['latency'][key]
+        print(f"  {key:<10} {old:>10} → {new:<10} {change(new, old)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки распознавания лиц")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('index', help="recall@1 и QPS приближённого индекса против точного перебора")
+    p.add_argument('--gallery', type=int, default=100000, help="размер синтетической галереи")
+    p.add_argument('--queries', type=int, default=2000, help="число запросов")
+    p.add_argument('--batch', type=int, default=8, help="лиц в одном запросе (как в кадре)")
+    p.add_argument('--nlist', type=int, default=0, help="число списков IVF (0 — авто)")
+    p.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    p.add_argument('--noise', type=float, default=0.25, help="шум запроса относительно эталона")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--output', help="сохранить результаты в JSON")
+    p.set_defaults(func=bench_index)
+
+    p = sub.add_parser('pipeline', help="прогон записи через process_frame: к/с, лиц/с, задержки по этапам")
+    p.add_argument('source', help="видеофайл, каталог с кадрами или маска (\"frames/*.jpg\")")
+    p.add_argument('--gallery', type=int, default=1000, help="размер синтетической галереи (1000–1000000)")
+    p.add_argument('--index', choices=['exact', 'ivf'], default='exact', help="индекс галереи")
+    p.add_argument('--nprobe', type=int, default=16, help="nprobe для индекса ivf")
+    p.add_argument('--mode', choices=['threads', 'processes'], default='threads', help="EXECUTION_MODE")
+    p.add_argument('--frames', type=int, default=0, help="ограничить число кадров (0 — вся запись)")
+    p.add_argument('--realtime', action='store_true', help="подавать кадры в темпе записи, а не с максимальной скоростью")
+    p.add_argument('--fps', type=float, default=25.0, help="частота кадров последовательности изображений")
+    p.add_argument('--no-motion', action='store_true', help="без детектора движения (детекция на каждом кадре)")
+    p.add_argument('--plant', type=int, default=0,
+                   help="добавить в галерею лица с первых N кадров записи (проверка совпадений и оповещений)")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    p.add_argument('--output', help="сохранить результаты в JSON")
+    p.set_defaults(func=bench_pipeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from tracker import box_iou
+
+# Выходные буферы resize/cvtColor: свои у каждого потока, растут до самого большого кадра
+_buffers = threading.local()
+
+
+def reusable_buffer(key, shape):
+    """Массив uint8 формы shape поверх переиспользуемого буфера потока (содержимое не очищается)"""
+    cache = getattr(_buffers, 'cache', None)
+    if cache is None:
+        cache = _buffers.cache = {}
+    size = int(np.prod(shape))
+    buffer = cache.get(key)
+    if buffer is None or buffer.size < size:
+        buffer = cache[key] = np.empty(size, dtype=np.uint8)
+    return buffer[:size].reshape(shape)
+
+
+def add_timing(timings, stage, start):
+    """Добавляет к timings[stage] время с start (time.perf_counter); timings=None — замеры не нужны"""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def resize_rgb(image, scale, key=0):
+    """Уменьшенная RGB-копия BGR-изображения в переиспользуемых буферах (без новых выделений памяти)
+
+    Результат действителен до следующего вызова с тем же key в этом потоке.
+    """
+    height, width = image.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    small = cv2.resize(image, size, dst=reusable_buffer(('small', key), (size[1], size[0], 3)))
+    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=reusable_buffer(('rgb', key), small.shape))
+
+
+def detect_faces(frame, regions, scale=0.5, cascade=False, coarse_scale=0.25, margin=0.5, refine_face_size=100,
+                 timings=None):
+    """Поиск лиц в заданных областях кадра (top, right, bottom, left)
+
+    Возвращает список (рамка в исходном кадре, RGB-изображение, рамка в нём);
+    encodings считаются позже и только для тех лиц, которым они нужны.
+    В режиме каскада кандидаты ищутся на сильно уменьшенном кадре (coarse_scale), а изображение
+    для encoding — кроп вокруг лица в исходном разрешении.
+    Если передан словарь timings, в него добавляется время этапов 'resize' и 'detect'.
+    """
+    if cascade:
+        scale = coarse_scale
+    detections = []
+    for index, (top, right, bottom, left) in enumerate(regions):
+        crop = frame[top:bottom, left:right]
+        if crop.shape[0] * scale < 20 or crop.shape[1] * scale < 20:
+            continue  # Слишком маленькая область: лица в ней не найти
+
+        # Изменение размера для ускорения обработки (буфер своей области: изображения нужны до encoding)
+        start = time.perf_counter()
+        rgb_small_frame = resize_rgb(crop, scale, key=index)
+        add_timing(timings, 'resize', start)
+
+        # Масштабируем обратно и переносим в координаты исходного кадра
+        start = time.perf_counter()
+        for location in face_recognition.face_locations(rgb_small_frame):
+            t, r, b, l = location
+            full_location = (
+                top + int(t / scale),
+                left + int(r / scale),
+                top + int(b / scale),
+                left + int(l / scale)
+            )
+            if cascade:
+                detections.append(refine_face(frame, full_location, margin, refine_face_size))
+            else:
+                detections.append((full_location, rgb_small_frame, location))
+        add_timing(timings, 'detect', start)
+    return detections
+
+
+def scale_location(location, from_shape, to_shape):
+    """Рамка (top, right, bottom, left) кадра from_shape в координатах кадра to_shape (субпоток → основной поток)"""
+    sy, sx = to_shape[0] / from_shape[0], to_shape[1] / from_shape[1]
+    top, right, bottom, left = location
+    return int(top * sy), int(right * sx), int(bottom * sy), int(left * sx)
+
+
+def crop_face(frame, location, margin=0.5):
+    """RGB-кроп исходного разрешения вокруг лица и рамка лица в нём"""
+    top, right, bottom, left = location
+    size = max(bottom - top, right - left, 1)
+    pad = int(size * margin)
+    height, width = frame.shape[:2]
+    crop_top, crop_left = max(0, top - pad), max(0, left - pad)
+    crop_bottom, crop_right = min(height, bottom + pad), min(width, right + pad)
+    rgb_crop = cv2.cvtColor(frame[crop_top:crop_bottom, crop_left:crop_right], cv2.COLOR_BGR2RGB)
+    return rgb_crop, (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+
+
+def refine_face(frame, location, margin=0.5, refine_face_size=100):
+    """Каскад: уточнение кандидата по кропу исходного разрешения"""
+    rgb_crop, candidate = crop_face(frame, location, margin)
+    crop_top, crop_left = location[0] - candidate[0], location[3] - candidate[3]
+    size = max(candidate[2] - candidate[0], candidate[1] - candidate[3], 1)
+
+    # Точная рамка: повторная детекция на кропе, уменьшенном так, чтобы лицо было ~refine_face_size пикселей
+    refine_scale = min(1.0, refine_face_size / size)
+    small_crop = cv2.resize(rgb_crop, (0, 0), fx=refine_scale, fy=refine_scale) if refine_scale < 1.0 else rgb_crop
+    refined = [
+        (int(t / refine_scale), int(r / refine_scale), int(b / refine_scale), int(l / refine_scale))
+        for t, r, b, l in face_recognition.face_locations(small_crop, number_of_times_to_upsample=0)
+    ]
+    if refined:
+        candidate = max(refined, key=lambda box: box_iou(box, candidate))
+
+    t, r, b, l = candidate
+    full_location = (crop_top + t, crop_left + r, crop_top + b, crop_left + l)
+    return full_location, rgb_crop, candidate
+
+
+def encode_faces(detections, batch_encoder=None):
+    """Encodings найденных лиц: пакетно через BatchEncoder или по вызову на изображение"""
+    groups = {}
+    for index, (_, image, location) in enumerate(detections):
+        groups.setdefault(id(image), (image, []))[1].append((index, location))
+
+    if batch_encoder:
+        # Запросы уходят в общий пакет вместе с лицами других камер
+        requests = [(items, batch_encoder.submit(image, [location for _, location in items]))
+                    for image, items in groups.values()]
+        results = [(items, future.result()) for items, future in requests]
+    else:
+        results = [(items, face_recognition.face_encodings(image, [location for _, location in items]))
+                   for image, items in groups.values()]
+
+    face_encodings = [None] * len(detections)
+    for items, encodings in results:
+        for (index, _), encoding in zip(items, encodings):
+            face_encodings[index] = encoding
+    return face_encodings
+
+
+def encode_locations(frame, locations, margin=0.25):
+    """Encodings лиц по рамкам в исходном кадре (кроп вокруг каждого лица); матрица float32"""
+    detections = [(location,) + crop_face(frame, location, margin) for location in locations]
+    encodings = encode_faces(detections)
+    return np.asarray(encodings, dtype=np.float32).reshape(len(locations), -1)
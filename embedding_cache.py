@@ -0,0 +1,172 @@
+import hashlib
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import face_recognition
+
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+
+
+def file_digest(path):
+    """SHA-1 содержимого файла — ключ кеша не зависит от имени и времени изменения"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def encode_image(path):
+    """Encoding первого лица на изображении или None (выполняется в процессе пула)
+
+    Ошибка чтения файла не прерывает пул: возвращается её текст, файл пропускается.
+    """
+    try:
+        image = face_recognition.load_image_file(path)
+        encodings = face_recognition.face_encodings(image)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return encodings[0] if encodings else None
+
+
+class EmbeddingCache:
+    """Кеш embeddings изображений на диске, ключ — хеш содержимого
+
+    Для неизменённых файлов (то же mtime и размер) хеш не пересчитывается.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.embeddings = {}  # хеш → encoding (None — лицо не найдено)
+        self.file_digests = {}  # путь → (mtime_ns, размер, хеш)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+                self.embeddings = data["embeddings"]
+                self.file_digests = data["file_digests"]
+            except Exception as e:
+                print(f"⚠️ Кеш embeddings повреждён, будет создан заново: {e}")
+
+    def digest(self, path):
+        st = os.stat(path)
+        cached = self.file_digests.get(path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        digest = file_digest(path)
+        self.file_digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"embeddings": self.embeddings, "file_digests": self.file_digests}, f)
+            os.replace(tmp_path, self.path)
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def encode_directory(directory, cache, workers=None):
+    """Encodings всех изображений папки: новые и изменённые файлы кодируются пулом процессов
+
+    Возвращает (encodings, names), имя — имя файла без расширения.
+    """
+    digests = {}
+    for path in list_images(directory):
+        try:
+            digests[path] = cache.digest(path)
+        except OSError as e:  # Файл удалён или недоступен между листингом и чтением
+            print(f"⚠️ Пропущен файл {path}: {e}")
+    paths = list(digests)
+
+    missing = {}
+    for path, digest in digests.items():
+        if digest not in cache.embeddings:
+            missing.setdefault(digest, path)
+
+    if missing:
+        print(f"⏳ Кодирование {len(missing)} новых изображений...")
+        start = time.time()
+        items = list(missing.items())
+        if len(items) > 1 and workers != 1:
+            # spawn, а не fork: загрузка вызывается и из потока наблюдения за папкой, пока работают
+            # захват, распознавание и веб-сервер, — блокировки их потоков не должны попасть в дочерний процесс
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results = list(pool.map(encode_image, [path for _, path in items], chunksize=4))
+        else:
+            results = [encode_image(path) for _, path in items]
+        failed = set()
+        for (digest, path), encoding in zip(items, results):
+            if isinstance(encoding, str):
+                print(f"⚠️ Пропущен файл {path}: {encoding}")
+                failed.add(digest)  # Не кешируется: попытка повторится при следующей загрузке
+                continue
+            cache.embeddings[digest] = encoding
+        paths = [path for path in paths if digests[path] not in failed]
+        print(f"✅ Закодировано за {time.time() - start:.1f} с")
+
+    # Удалённые файлы больше не держим в кеше путей
+    for path in list(cache.file_digests):
+        if path not in digests and os.path.dirname(path) == directory:
+            del cache.file_digests[path]
+    # Embeddings удалённых и изменённых файлов тоже: остаются только хеши, на которые ссылаются пути
+    live = {entry[2] for entry in cache.file_digests.values()}
+    for digest in [digest for digest in cache.embeddings if digest not in live]:
+        del cache.embeddings[digest]
+    cache.save()
+
+    encodings = []
+    names = []
+    for path in paths:
+        encoding = cache.embeddings[digests[path]]
+        if encoding is None:
+            print(f"⚠️ Лицо не найдено: {path}")
+            continue
+        encodings.append(encoding)
+        names.append(os.path.splitext(os.path.basename(path))[0])
+    return encodings, names
+
+
+class DirectoryWatcher(threading.Thread):
+    """Опрос папки с известными лицами: при добавлении, удалении или изменении файлов вызывает on_change"""
+
+    def __init__(self, directory, on_change, interval=5.0):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.on_change = on_change
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for path in list_images(self.directory):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                state = self._scan()
+                if state != self._state:
+                    self._state = state
+                    print("📂 Изменилась папка известных лиц, обновление базы...")
+                    self.on_change()
+            except Exception as e:
+                print(f"❌ Ошибка обновления базы лиц: {e}")
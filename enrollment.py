@@ -0,0 +1,346 @@
+"""Массовое добавление лиц в базу: каталог, zip-архив или загруженные файлы
+
+Имя человека — имя файла без расширения ("Иванов Иван.jpg") или имя подкаталога, если фотографии
+человека лежат в отдельной папке ("Иванов Иван/1.jpg", "Иванов Иван/2.jpg").
+
+    python enrollment.py employees/ --db face_db
+    python enrollment.py employees.zip --db face_db --on-duplicate skip --report report.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import face_recognition
+import numpy as np
+
+from face_gallery import ENCODING_DIM, FaceGallery
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def _is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def scan_directory(directory):
+    """Изображения каталога (рекурсивно) с именами людей: [(путь, имя), ...]"""
+    items = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if not _is_image(filename):
+                continue
+            path = os.path.join(root, filename)
+            if os.path.samefile(root, directory):
+                name = os.path.splitext(filename)[0]
+            else:
+                name = os.path.relpath(root, directory).split(os.sep)[0]
+            items.append((path, name))
+    return items
+
+
+def extract_archive(archive_path, directory):
+    """Распаковка изображений zip-архива в directory (пути с ".." и абсолютные пропускаются)"""
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            parts = member.filename.replace("\\", "/").split("/")
+            if member.is_dir() or not _is_image(member.filename) or ".." in parts or member.filename.startswith("/"):
+                continue
+            target = os.path.join(directory, *parts)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with archive.open(member) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+
+def collect_images(source, workdir):
+    """Изображения из каталога, zip-архива или отдельного файла: [(путь, имя), ...]"""
+    if os.path.isdir(source):
+        return scan_directory(source)
+    if zipfile.is_zipfile(source):
+        # Отдельный каталог на архив: архивы с одинаковыми именами не смешиваются
+        directory = tempfile.mkdtemp(prefix=f"{os.path.splitext(os.path.basename(source))[0]}-", dir=workdir)
+        extract_archive(source, directory)
+        return scan_directory(directory)
+    if os.path.isfile(source) and _is_image(source):
+        return [(source, os.path.splitext(os.path.basename(source))[0])]
+    raise ValueError(f"Не каталог, не zip-архив и не изображение: {source}")
+
+
+def expand_items(items, workdir):
+    """Загруженные файлы: zip-архивы заменяются их изображениями, остальные — как есть"""
+    expanded = []
+    for path, name in items:
+        if path.lower().endswith('.zip'):
+            expanded.extend(collect_images(path, workdir))
+        else:
+            expanded.append((path, name))
+    return expanded
+
+
+def encode_enrollment_image(path, max_size=1280):
+    """Encoding лица на фото для базы (выполняется в процессе пула): (encoding или None, статус)
+
+    Большие фото уменьшаются до max_size по большей стороне. Если лиц несколько, берётся
+    самое крупное, статус — "multiple_faces".
+    """
+    try:
+        image = face_recognition.load_image_file(path)
+    except Exception as e:
+        return None, f"error: {e}"
+    scale = max_size / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return None, "no_face"
+    location = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    encoding = face_recognition.face_encodings(image, [location])[0]
+    return np.asarray(encoding, dtype=np.float32), "multiple_faces" if len(locations) > 1 else "ok"
+
+
+def _search(gallery, encodings, k, chunk=512):
+    """Поиск по индексу галереи частями: матрица расстояний не больше chunk × размер галереи"""
+    for offset in range(0, len(encodings), chunk):
+        top, top_dist = gallery.index.search(encodings[offset:offset + chunk], k)
+        yield from zip(range(offset, offset + len(top)), top, top_dist)
+
+
+def find_duplicates(encodings, names, known_encodings, known_names, max_distance, gallery_factory=FaceGallery,
+                    chunk=512):
+    """Возможные дубликаты личностей: [(индекс нового лица, похожее имя, расстояние, где найдено), ...]
+
+    Новое лицо сравнивается с базой через индекс галереи (gallery_factory) и точным перебором —
+    с лицами пакета под другими именами. Похожее лицо с другим именем — вероятно, тот же человек под другим именем; с тем же
+    именем в базе — человек уже добавлен. Из пары похожих лиц пакета отмечается более позднее.
+    """
+    duplicates = []
+    if not len(encodings):
+        return duplicates
+    if len(known_names):
+        known = gallery_factory(known_encodings, known_names)
+        for i, top, top_dist in _search(known, encodings, 1, chunk):
+            if len(top) and top[0] >= 0 and top_dist[0] < max_distance:
+                duplicates.append((i, known.names[top[0]], float(top_dist[0]), "database"))
+
+    # Внутри пакета: фото одного человека под одним именем — не дубликаты, поэтому сравнение
+    # идёт только с более ранними лицами других имён (соседи по индексу могут быть все одного имени)
+    batch = FaceGallery(encodings, names)
+    name_ids = np.unique(np.asarray(names, dtype=object), return_inverse=True)[1]
+    positions = np.arange(len(names))
+    for offset in range(0, len(encodings), chunk):
+        dist = batch.distances(encodings[offset:offset + chunk])
+        rows = positions[offset:offset + len(dist)]
+        dist[(positions[None, :] >= rows[:, None]) | (name_ids[None, :] == name_ids[rows][:, None])] = np.inf
+        nearest = dist.argmin(axis=1)
+        for i, j, distance in zip(rows, nearest, dist[np.arange(len(dist)), nearest]):
+            if distance < max_distance:
+                duplicates.append((int(i), names[j], float(distance), "batch"))
+    return duplicates
+
+
+class EnrollmentJob:
+    """Задание массового добавления: кодирование пулом процессов, проверка дубликатов, одна транзакция
+
+    Прогресс доступен через progress() во время выполнения.
+    on_duplicate: "flag" — добавить и отметить в отчёте, "skip" — не добавлять похожие лица.
+    """
+
+    def __init__(self, job_id, items, source, workdir=None, on_duplicate="flag", duplicate_distance=0.45,
+                 dry_run=False):
+        self.job_id = job_id
+        self.items = items  # [(путь, имя), ...] (zip-архивы раскрываются) или None — собрать из source
+        self.source = source
+        self.workdir = workdir  # Временный каталог задания (создаётся при запуске), удаляется по завершении
+        self.on_duplicate = on_duplicate
+        self.duplicate_distance = duplicate_distance
+        self.dry_run = dry_run
+        self.state = "queued"
+        self.total = len(items) if items else 0
+        self.processed = 0
+        self.enrolled = 0
+        self.failed = []  # [{'file', 'name', 'status'}]
+        self.duplicates = []  # [{'file', 'name', 'similar_to', 'distance', 'found_in', 'skipped'}]
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def progress(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'source': self.source,
+            'total': self.total,
+            'processed': self.processed,
+            'enrolled': self.enrolled,
+            'failed': self.failed,
+            'duplicates': self.duplicates,
+            'error': self.error,
+            'elapsed_sec': round(elapsed, 1),
+            'dry_run': self.dry_run,
+        }
+
+    def run(self, face_store, workers=None, gallery_factory=FaceGallery):
+        """Выполнение задания; workers — процессов кодирования (None — по числу ядер)"""
+        self.state = "running"
+        self.started_at = time.time()
+        try:
+            if self.workdir is None:
+                self.workdir = tempfile.mkdtemp(prefix="enrollment-")
+            self._run(face_store, workers, gallery_factory)
+            self.state = "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"❌ Ошибка задания добавления лиц {self.job_id}: {e}")
+        finally:
+            self.finished_at = time.time()
+            if self.workdir:
+                shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _run(self, face_store, workers, gallery_factory):
+        if self.items is None:
+            self.items = collect_images(self.source, self.workdir)
+        else:
+            self.items = expand_items(self.items, self.workdir)
+        self.total = len(self.items)
+        print(f"⏳ Добавление лиц ({self.source}): {self.total} изображений")
+
+        results = [None] * self.total
+        if self.total > 1 and workers != 1:
+            # spawn, а не fork: родитель может быть веб-сервером с потоками захвата и оповещений,
+            # и блокировки, захваченные в момент fork, остались бы захваченными в дочернем процессе
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(encode_enrollment_image, path): i for i, (path, _) in enumerate(self.items)}
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    self.processed += 1
+        else:
+            for i, (path, _) in enumerate(self.items):
+                results[i] = encode_enrollment_image(path)
+                self.processed += 1
+
+        encodings, names, files = [], [], []
+        for (path, name), (encoding, status) in zip(self.items, results):
+            if encoding is None:
+                self.failed.append({'file': os.path.basename(path), 'name': name, 'status': status})
+                continue
+            encodings.append(encoding)
+            names.append(name)
+            files.append(os.path.basename(path))
+
+        known_encodings, known_names, _ = face_store.snapshot()
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        skip = set()
+        for i, similar, distance, found_in in find_duplicates(encodings, names, known_encodings, known_names,
+                                                              self.duplicate_distance, gallery_factory):
+            skipped = self.on_duplicate == "skip"
+            if skipped:
+                skip.add(i)
+            self.duplicates.append({'file': files[i], 'name': names[i], 'similar_to': similar,
+                                    'distance': round(distance, 4), 'found_in': found_in, 'skipped': skipped})
+
+        keep = [i for i in range(len(names)) if i not in skip]
+        if keep and not self.dry_run:
+            face_store.add_many(encodings[keep], [names[i] for i in keep], source=os.path.basename(self.source),
+                                job=self.job_id)
+        self.enrolled = len(keep)
+        print(f"✅ Добавление лиц ({self.source}){' (проверка без записи)' if self.dry_run else ''}: "
+              f"добавлено {self.enrolled}, без лица {len(self.failed)}, "
+              f"возможных дубликатов {len(self.duplicates)}")
+
+
+class EnrollmentManager:
+    """Фоновые задания массового добавления лиц: выполняются по одному, прогресс — по job_id"""
+
+    def __init__(self, face_store, workers=2, gallery_factory=FaceGallery, keep_jobs=50, **job_options):
+        self.face_store = face_store
+        self.workers = workers  # Немного процессов: задание не должно забирать все ядра у распознавания
+        self.gallery_factory = gallery_factory
+        self.job_options = job_options  # Параметры EnrollmentJob по умолчанию
+        self._jobs = {}
+        self._finished = deque()
+        self._keep_jobs = keep_jobs
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._thread = None
+
+    def submit(self, source, items=None, workdir=None, **options):
+        """Постановка задания в очередь; items — готовый список (путь, имя), иначе собирается из source"""
+        job = EnrollmentJob(f"{int(time.time())}-{next(self._ids)}", items, source, workdir,
+                            **dict(self.job_options, **options))
+        with self._cond:
+            self._jobs[job.job_id] = job
+            self._queue.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="enrollment", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        return [job.progress() for job in sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+            job.run(self.face_store, self.workers, self.gallery_factory)
+            with self._cond:
+                # Держим отчёты только о последних keep_jobs заданиях
+                self._finished.append(job.job_id)
+                while len(self._finished) > self._keep_jobs:
+                    self._jobs.pop(self._finished.popleft(), None)
+
+
+def main():
+    from face_store import FaceStore
+
+    parser = argparse.ArgumentParser(description="Массовое добавление лиц в базу")
+    parser.add_argument('source', help="каталог с фото, zip-архив или файл изображения")
+    parser.add_argument('--db', default="face_db", help="каталог базы лиц")
+    parser.add_argument('--workers', type=int, default=None, help="процессов кодирования (по умолчанию — по числу ядер)")
+    parser.add_argument('--duplicate-distance', type=float, default=0.45,
+                        help="расстояние, ближе которого лица считаются возможным дубликатом")
+    parser.add_argument('--on-duplicate', choices=['flag', 'skip'], default='flag',
+                        help="flag — добавить и отметить, skip — не добавлять")
+    parser.add_argument('--dry-run', action='store_true', help="только проверить, без записи в базу")
+    parser.add_argument('--report', help="сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    job = EnrollmentJob("cli", None, args.source, on_duplicate=args.on_duplicate,
+                        duplicate_distance=args.duplicate_distance, dry_run=args.dry_run)
+    job.run(FaceStore(args.db), workers=args.workers)
+    report = job.progress()
+    for item in report['failed']:
+        print(f"⚠️ {item['file']} ({item['name']}): {item['status']}")
+    for item in report['duplicates']:
+        print(f"👯 {item['file']} ({item['name']}) похоже на '{item['similar_to']}' "
+              f"({item['found_in']}, расстояние {item['distance']}){' — пропущено' if item['skipped'] else ''}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Отчёт сохранён: {args.report}")
+    if report['state'] == "failed":
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    name TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_name_ts ON events (name, ts);
+CREATE INDEX IF NOT EXISTS events_camera_ts ON events (camera, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def parse_time(value):
+    """Время из параметра запроса: секунды epoch или ISO-строка ("2024-05-01 12:00:00"); None — не задано"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class EventStore:
+    """Журнал событий распознавания: последние события в памяти, вся история в SQLite
+
+    В памяти — кольцо из recent последних событий для дашборда, поэтому память не растёт
+    со временем работы. История на диске переживает перезапуск, индексирована по времени,
+    имени и камере; события старше retention_days удаляются. Очистка дашборда не удаляет
+    историю, а только скрывает уже показанные события (граница хранится в базе).
+    """
+
+    def __init__(self, path, recent=500, retention_days=None):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._recent = deque(maxlen=recent)
+        self._last_prune = 0.0
+        self.listeners = []  # listener(kind, data): 'event' — новое событие, 'cleared' — очистка дашборда
+        with self._lock:
+            self.cleared_id = int(self._meta('cleared_id', 0))
+            self._count()
+            self._prune()
+            rows = self._conn.execute(
+                "SELECT id, ts, name, camera, data FROM events WHERE id > ? ORDER BY id DESC LIMIT ?",
+                (self.cleared_id, recent)).fetchall()
+        self._recent.extend(self._event(row) for row in reversed(rows))
+
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _count(self):
+        self._total = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        self._active = self._conn.execute(
+            "SELECT COUNT(*) FROM events WHERE id > ?", (self.cleared_id,)).fetchone()[0]
+
+    @staticmethod
+    def _event(row):
+        event_id, ts, name, camera, data = row
+        event = json.loads(data)
+        event.update(id=event_id, ts=ts, timestamp=format_time(ts), name=name, camera=camera)
+        return event
+
+    def _prune(self):
+        """Удаление событий старше retention_days (не чаще раза в час)"""
+        if not self.retention_days or time.time() - self._last_prune < 3600:
+            return
+        self._last_prune = time.time()
+        with self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM events WHERE ts < ?", (time.time() - self.retention_days * 86400,)).rowcount
+        if deleted:
+            self._count()
+            print(f"🧹 Удалено старых событий: {deleted}")
+
+    def add(self, name, camera, ts=None, **data):
+        """Запись события; возвращает его словарь (id, ts, timestamp, name, camera и поля data)"""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO events (ts, name, camera, data) VALUES (?, ?, ?, ?)",
+                    (ts, name, camera, json.dumps(data, ensure_ascii=False)))
+            event = dict(data, id=cursor.lastrowid, ts=ts, timestamp=format_time(ts), name=name, camera=camera)
+            self._recent.append(event)
+            self._total += 1
+            self._active += 1
+            self._prune()
+        self._notify('event', event)
+        return event
+
+    def _notify(self, kind, data):
+        for listener in self.listeners:
+            try:
+                listener(kind, data)
+            except Exception as e:
+                print(f"❌ Ошибка обработчика событий: {e}")
+
+    def recent(self, limit=50):
+        """Последние события после очистки дашборда, новые первыми (из памяти)"""
+        with self._lock:
+            count = min(limit, len(self._recent))
+            return [self._recent[-1 - i] for i in range(count)]
+
+    def after(self, event_id, limit=50):
+        """События новее event_id (курсор клиента), новые первыми; из памяти"""
+        with self._lock:
+            events = []
+            for event in reversed(self._recent):
+                if event['id'] <= event_id or len(events) >= limit:
+                    break
+                events.append(event)
+            return events
+
+    def etag(self):
+        """Версия состояния дашборда: меняется при новом событии и при очистке"""
+        return f"{self.last_id()}-{self.cleared_id}"
+
+    def count(self):
+        """Всего событий в истории"""
+        return self._total
+
+    def active_count(self):
+        """Событий после последней очистки дашборда"""
+        return self._active
+
+    def last_id(self):
+        with self._lock:
+            return self._recent[-1]['id'] if self._recent else self.cleared_id
+
+    def query(self, name=None, camera=None, since=None, until=None, before_id=None, limit=50):
+        """Поиск по истории, новые первыми
+
+        since/until — границы времени (epoch), before_id — курсор следующей страницы
+        (id последнего события предыдущей страницы).
+        """
+        conditions, params = [], []
+        for condition, value in (("name = ?", name), ("camera = ?", camera), ("ts >= ?", since),
+                                 ("ts < ?", until), ("id < ?", before_id)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        sql = "SELECT id, ts, name, camera, data FROM events"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._event(row) for row in rows]
+
+    def clear(self):
+        """Очистка дашборда: события остаются в истории, но больше не показываются как активные"""
+        with self._lock:
+            self.cleared_id = self._recent[-1]['id'] if self._recent else self.cleared_id
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cleared_id', ?)",
+                                   (str(self.cleared_id),))
+            self._recent.clear()
+            self._active = 0
+        self._notify('cleared', {'cleared_id': self.cleared_id})
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,108 @@
+import itertools
+import json
+import queue
+import threading
+
+
+class Subscription:
+    """Подписчик рассылки: своя ограниченная очередь сообщений"""
+
+    def __init__(self, subscription_id, queue_size):
+        self.subscription_id = subscription_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0  # Сколько раз очередь переполнялась
+
+
+class EventBroadcaster:
+    """Рассылка событий браузерам через Server-Sent Events
+
+    publish() никогда не блокирует конвейер распознавания: у каждого клиента своя очередь
+    из queue_size сообщений. Если клиент не успевает читать, его очередь очищается и ему
+    отправляется resync — клиент сам дочитывает пропущенное через опрос с курсором.
+    Клиентов сверх max_clients сервер не принимает, они остаются на опросе.
+    """
+
+    def __init__(self, queue_size=100, keepalive=15.0, max_clients=50):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.max_clients = max_clients
+        self.published = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Новая подписка или None, если клиентов уже max_clients"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscription = Subscription(next(self._ids), self.queue_size)
+            self._subscribers[subscription.subscription_id] = subscription
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription.subscription_id, None)
+
+    def publish(self, event, data, event_id=None):
+        """Сообщение всем подписчикам (event — тип SSE-события, data — JSON-совместимые данные)"""
+        message = format_sse(event, data, event_id)
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+            self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                self._overflow(subscription)
+
+    def _overflow(self, subscription):
+        # Медленный клиент: вместо накопления очереди — сигнал перечитать состояние
+        subscription.dropped += 1
+        with self._lock:
+            self.dropped += 1
+        while True:
+            try:
+                subscription.queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            subscription.queue.put_nowait(format_sse('resync', {}))
+        except queue.Full:
+            pass
+
+    def stream(self, subscription, initial=()):
+        """Генератор текста SSE для ответа Flask; initial — сообщения, отправляемые первыми"""
+        try:
+            yield "retry: 3000\n\n"
+            for message in initial:
+                yield message
+            while True:
+                try:
+                    yield subscription.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    # Комментарий-пинг: держит соединение через прокси и выявляет отключившихся клиентов
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._subscribers), 'published': self.published, 'dropped': self.dropped}
+
+
+def format_sse(event, data, event_id=None):
+    """Сообщение в формате text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # nginx: не буферизовать поток
+}
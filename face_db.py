@@ -0,0 +1,345 @@
+"""База лиц на диске: memory-mapped матрица embeddings, таблица имён и журнал добавлений
+
+Структура каталога базы (g — номер поколения из manifest.json):
+
+    manifest.json        — текущее поколение и число записей в нём (атомарно заменяется при уплотнении)
+    embeddings.<g>.f32   — матрица float32 фиксированной ширины, открывается через np.memmap
+    names.<g>.jsonl      — имена и метаданные, одна JSON-строка на строку матрицы
+    append.<g>.log       — журнал добавлений после последнего уплотнения
+
+Добавление лица — одна дописанная в журнал запись с CRC и fsync, без перезаписи всей базы.
+Оборванная при сбое запись в конце журнала отбрасывается. Когда журнал вырастает до
+compact_threshold записей, он сливается с матрицей в новое поколение.
+
+Перенос старой базы:
+
+    python face_db.py migrate face_database.pkl face_db
+"""
+import argparse
+import glob
+import json
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна, остаётся блокировка потоков
+    fcntl = None
+
+ENCODING_DIM = 128
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".lock"
+_RECORD_HEADER = struct.Struct('<II')  # длина полезной нагрузки, crc32
+_VECTOR_BYTES = ENCODING_DIM * 4
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_file_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _encode_record(encoding, meta):
+    payload = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM).tobytes()
+    payload += json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class FaceDatabase:
+    """Append-only база лиц, общая для нескольких процессов"""
+
+    def __init__(self, path, compact_threshold=1024):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(self._manifest_path()):
+                self._write_generation(0, np.empty((0, ENCODING_DIM), dtype=np.float32), [])
+            self._load_generation()
+
+    # ---------- файлы ----------
+
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST_NAME)
+
+    def _file(self, kind, generation):
+        ext = {'embeddings': 'f32', 'names': 'jsonl', 'append': 'log'}[kind]
+        return os.path.join(self.path, f"{kind}.{generation}.{ext}")
+
+    @contextmanager
+    def _locked(self):
+        """Блокировка потоков процесса и (где доступно) других процессов, пишущих в ту же базу"""
+        with self._lock:
+            # flock не реентерабелен: файл блокируется только на внешнем уровне вложенности
+            if fcntl is None or self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(os.path.join(self.path, LOCK_NAME), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_generation(self, generation, matrix, records):
+        """Запись нового поколения; замена manifest.json — точка фиксации"""
+        _write_file_atomic(self._file('embeddings', generation), np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+        names_data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        _write_file_atomic(self._file('names', generation), names_data.encode('utf-8'))
+        open(self._file('append', generation), "wb").close()
+        manifest = {'format': FORMAT_VERSION, 'dim': ENCODING_DIM, 'generation': generation, 'count': len(records)}
+        _write_file_atomic(self._manifest_path(), json.dumps(manifest).encode('utf-8'))
+        _fsync_dir(self.path)
+
+        # Файлы прошлых поколений и недописанные временные файлы больше не нужны
+        for stale in glob.glob(os.path.join(self.path, "*.*.*")):
+            if f".{generation}." not in os.path.basename(stale):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass  # Файл ещё открыт другим процессом (Windows) — удалим при следующем уплотнении
+
+    def _load_generation(self):
+        manifest = self._read_manifest()
+        if manifest.get('dim') != ENCODING_DIM:
+            raise ValueError(f"Несовместимая размерность базы: {manifest.get('dim')}")
+        self.generation = manifest['generation']
+        count = manifest['count']
+
+        if count:
+            self._base = np.memmap(self._file('embeddings', self.generation), dtype=np.float32,
+                                   mode='r', shape=(count, ENCODING_DIM))
+        else:
+            self._base = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        with open(self._file('names', self.generation), "r", encoding="utf-8") as f:
+            self._records = [json.loads(line) for line in f if line.strip()]
+
+        self._tail = []
+        self._log_offset = 0
+        self._buffer = None  # Копия матрицы поколения с запасом под журнал (см. _tail_matrix)
+        self._buffered = 0  # Сколько записей журнала уже скопировано в _buffer
+        self._matrix = None
+        self._names = None
+        self._read_log()
+
+    def _read_log(self):
+        """Дочитывает новые записи журнала; возвращает число прочитанных"""
+        log_path = self._file('append', self.generation)
+        try:
+            with open(log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        pos = 0
+        added = 0
+        while pos + _RECORD_HEADER.size <= len(data):
+            length, crc = _RECORD_HEADER.unpack_from(data, pos)
+            payload = data[pos + _RECORD_HEADER.size:pos + _RECORD_HEADER.size + length]
+            if length < _VECTOR_BYTES or len(payload) < length or zlib.crc32(payload) != crc:
+                break  # Оборванная или повреждённая запись в конце журнала
+            self._tail.append(np.frombuffer(payload[:_VECTOR_BYTES], dtype=np.float32))
+            self._records.append(json.loads(payload[_VECTOR_BYTES:].decode('utf-8')))
+            pos += _RECORD_HEADER.size + length
+            added += 1
+
+        self._log_offset += pos
+        if added:
+            self._matrix = None
+            self._names = None
+        return added
+
+    # ---------- чтение ----------
+
+    def __len__(self):
+        return len(self._records)
+
+    def stamp(self):
+        """Дешёвый признак изменения базы другим процессом: mtime манифеста и размер журнала"""
+        try:
+            manifest_mtime = os.stat(self._manifest_path()).st_mtime_ns
+            log_size = os.stat(self._file('append', self.generation)).st_size
+        except FileNotFoundError:
+            return None
+        return manifest_mtime, log_size
+
+    def refresh(self):
+        """Подхватывает изменения, сделанные другими процессами; True, если база изменилась"""
+        with self._lock:
+            if self._read_manifest()['generation'] != self.generation:
+                self._load_generation()
+                return True
+            return self._read_log() > 0
+
+    def snapshot(self):
+        """Согласованная пара (матрица encodings, имена)
+
+        Без записей в журнале матрица — это memmap файла без копирования в память.
+        """
+        with self._lock:
+            if self._matrix is None:
+                if self._tail:
+                    self._matrix = self._tail_matrix()
+                else:
+                    self._matrix = self._base
+                self._names = [r['name'] for r in self._records]
+            return self._matrix, self._names
+
+    def _tail_matrix(self):
+        """Матрица поколения с записями журнала
+
+        Матрица копируется в память один раз на поколение, в буфер с запасом на compact_threshold
+        записей; новые записи журнала дописываются в него на месте. Прежние снимки — срезы того же
+        буфера: их строки не меняются, поэтому они остаются согласованными.
+        """
+        base_count = len(self._base)
+        total = base_count + len(self._tail)
+        if self._buffer is None or len(self._buffer) < total:
+            capacity = base_count + max(2 * len(self._tail), self.compact_threshold)
+            buffer = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+            if self._buffer is None:
+                buffer[:base_count] = self._base
+            else:
+                buffer[:base_count + self._buffered] = self._buffer[:base_count + self._buffered]
+            self._buffer = buffer
+        self._buffer[base_count + self._buffered:total] = np.stack(self._tail[self._buffered:])
+        self._buffered = len(self._tail)
+        return self._buffer[:total]
+
+    def records(self):
+        """Метаданные всех записей (имя, время добавления, источник)"""
+        with self._lock:
+            return list(self._records)
+
+    # ---------- запись ----------
+
+    def append(self, encodings, names, **meta):
+        """Добавление лиц одной записью в журнал с fsync (одна транзакция на весь пакет)"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        names = list(names)
+        if len(names) != len(encodings):
+            raise ValueError(f"Количество имён ({len(names)}) не совпадает с количеством encodings ({len(encodings)})")
+        if not len(names):
+            return
+
+        added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        records = [dict(meta, name=name, added=added) for name in names]
+        with self._locked():
+            self.refresh()
+            log_path = self._file('append', self.generation)
+            with open(log_path, "r+b") as f:
+                # Отрезаем оборванный хвост прошлой неудачной записи, чтобы не писать после мусора
+                f.truncate(self._log_offset)
+                f.seek(self._log_offset)
+                f.write(b"".join(_encode_record(e, r) for e, r in zip(encodings, records)))
+                f.flush()
+                os.fsync(f.fileno())
+            self._read_log()
+
+            if len(self._tail) >= self.compact_threshold:
+                self.compact()
+
+    def compact(self):
+        """Слияние журнала с матрицей в новое поколение"""
+        with self._locked():
+            self.refresh()
+            matrix, _ = self.snapshot()
+            self._write_generation(self.generation + 1, matrix, self._records)
+            self._load_generation()
+            print(f"🗜️ База лиц уплотнена: {len(self)} лиц, поколение {self.generation}")
+
+
+def migrate_pickle(pickle_path, db_path):
+    """Однократный перенос старой базы face_database.pkl в новый формат
+
+    База собирается во временном каталоге рядом с db_path и переименовывается только после
+    успешной записи: прерванный перенос не оставляет полузаписанную базу.
+    """
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    if os.path.exists(db_path):
+        count = len(FaceDatabase(db_path))
+        if count:
+            raise ValueError(f"База {db_path} уже содержит {count} лиц, перенос отменён")
+
+    db_path = os.path.normpath(db_path)
+    tmp_path = tempfile.mkdtemp(prefix=f"{os.path.basename(db_path)}.migrate-", dir=os.path.dirname(os.path.abspath(db_path)))
+    try:
+        db = FaceDatabase(tmp_path)
+        db.append(data["encodings"], data["names"], source=os.path.basename(pickle_path))
+        db.compact()
+        if os.path.exists(db_path):
+            shutil.rmtree(db_path)  # Пустая база: заменяется перенесённой
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    _fsync_dir(os.path.dirname(os.path.abspath(db_path)))
+
+    db = FaceDatabase(db_path)
+    print(f"✅ Перенесено {len(db)} лиц из {pickle_path} в {db_path}")
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание базы лиц")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('migrate', help="перенос face_database.pkl в новый формат")
+    p.add_argument('pickle_path')
+    p.add_argument('db_path')
+    p = sub.add_parser('compact', help="слияние журнала добавлений с матрицей")
+    p.add_argument('db_path')
+    p = sub.add_parser('info', help="сводка по базе")
+    p.add_argument('db_path')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_pickle(args.pickle_path, args.db_path)
+    elif args.command == 'compact':
+        FaceDatabase(args.db_path).compact()
+    else:
+        db = FaceDatabase(args.db_path)
+        print(f"Лиц: {len(db)}, поколение: {db.generation}, в журнале: {len(db._tail)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+
+from face_index import create_index, load_index, matrix_fingerprint, save_index
+
+ENCODING_DIM = 128  # Размерность encodings face_recognition (dlib)
+
+
+class FaceGallery:
+    """Галерея известных лиц: все encodings в одной непрерывной float32-матрице
+
+    Поиск идёт через подключаемый индекс (face_index): точный перебор или приближённый IVF.
+    Если задан index_path, построенный индекс сохраняется рядом с базой и переиспользуется при старте.
+    """
+
+    def __init__(self, encodings=(), names=(), index="exact", index_path=None, **index_params):
+        self._lock = threading.Lock()
+        self.index_kind = index
+        self.index_params = index_params
+        self.index_path = index_path
+        self.set(encodings, names)
+
+    def set(self, encodings, names):
+        """Полная замена содержимого галереи с перестроением индекса"""
+        matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM))
+        names = list(names)
+        if len(names) != len(matrix):
+            raise ValueError(f"Количество имён ({len(names)}) не совпадает с количеством encodings ({len(matrix)})")
+
+        index = create_index(self.index_kind, **self.index_params)
+        if self.index_path and len(matrix):
+            fingerprint = matrix_fingerprint(matrix)
+            if not load_index(index, self.index_path, matrix, fingerprint):
+                index.build(matrix)
+                if save_index(index, self.index_path, fingerprint):
+                    print(f"💾 Индекс галереи ({index.kind}) сохранён: {self.index_path}")
+        else:
+            index.build(matrix)
+
+        # Квадраты норм считаем один раз при загрузке, а не на каждом кадре
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        with self._lock:
+            self._data = (matrix, sq_norms, names, index)
+
+    def __len__(self):
+        return len(self._data[2])
+
+    @property
+    def names(self):
+        return self._data[2]
+
+    @property
+    def encodings(self):
+        return self._data[0]
+
+    @property
+    def index(self):
+        return self._data[3]
+
+    def distances(self, face_encodings):
+        """Матрица точных евклидовых расстояний (лица кадра × галерея) за один проход"""
+        matrix, sq_norms, _, _ = self._data
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(matrix) or not len(queries):
+            return np.empty((len(queries), len(matrix)), dtype=np.float32)
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab: одно матричное умножение на весь кадр
+        sq = np.einsum('ij,ij->i', queries, queries)[:, None] + sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def match(self, face_encodings, k=1):
+        """Top-k ближайших известных лиц для каждого лица: список списков (имя, расстояние)"""
+        _, _, names, index = self._data
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        top, top_dist = index.search(queries, k)
+        return [
+            [(names[idx], float(d)) for idx, d in zip(row_idx, row_dist) if idx >= 0]
+            for row_idx, row_dist in zip(top, top_dist)
+        ]
+
+    def identify(self, face_encodings, tolerance=0.6, unknown="Unknown"):
+        """Лучшее совпадение для каждого лица: список (имя, расстояние); дальше порога — unknown"""
+        results = []
+        for candidates in self.match(face_encodings, k=1):
+            if candidates and candidates[0][1] < tolerance:
+                results.append(candidates[0])
+            else:
+                results.append((unknown, candidates[0][1] if candidates else None))
+        return results
@@ -0,0 +1,209 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def _sq_norms(matrix):
+    return np.einsum('ij,ij->i', matrix, matrix)
+
+
+def _pairwise_distances(queries, matrix, matrix_sq_norms=None):
+    """Евклидовы расстояния (запросы × матрица) через одно матричное умножение"""
+    if matrix_sq_norms is None:
+        matrix_sq_norms = _sq_norms(matrix)
+    sq = _sq_norms(queries)[:, None] + matrix_sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+    np.maximum(sq, 0.0, out=sq)
+    return np.sqrt(sq, out=sq)
+
+
+def _top_k(dist, k):
+    """Индексы и расстояния k ближайших по каждой строке, отсортированные по возрастанию"""
+    k = min(k, dist.shape[1])
+    if k < dist.shape[1]:
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+    top_dist = np.take_along_axis(dist, top, axis=1)
+    order = np.argsort(top_dist, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_dist, order, axis=1)
+
+
+def matrix_fingerprint(matrix):
+    """Отпечаток содержимого галереи: по нему проверяется актуальность сохранённого индекса"""
+    digest = hashlib.sha1(np.ascontiguousarray(matrix).view(np.uint8)).hexdigest()
+    return f"{len(matrix)}:{digest}"
+
+
+class ExactIndex:
+    """Точный поиск: полный перебор галереи"""
+
+    kind = "exact"
+
+    def __init__(self):
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def build(self, matrix):
+        self.matrix = matrix
+        self.sq_norms = _sq_norms(matrix)
+
+    def search(self, queries, k=1):
+        """Возвращает (индексы, расстояния) формы (число запросов, k)"""
+        if not len(self.matrix) or not len(queries):
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        return _top_k(_pairwise_distances(queries, self.matrix, self.sq_norms), k)
+
+    def state(self):
+        return {}
+
+    def load_state(self, matrix, state):
+        self.build(matrix)
+
+
+class IVFIndex:
+    """Приближённый поиск IVF: k-means разбиение галереи на списки, поиск в nprobe ближайших
+
+    nprobe — ручка точность/скорость: больше списков просматривается — выше recall, ниже QPS.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist=0, nprobe=8, train_iterations=10, seed=0):
+        self.nlist = nlist  # 0 — подобрать автоматически (~4·√N)
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lists = np.empty((0, 0), dtype=np.float32)
+        self.lists_sq_norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _train(self, matrix, nlist):
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(matrix), nlist * 40)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assign = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Пустые кластеры переинициализируем случайными точками выборки
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        return centroids
+
+    @staticmethod
+    def _assign(matrix, centroids, chunk=8192):
+        centroid_sq = _sq_norms(centroids)
+        assign = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk):
+            block = matrix[start:start + chunk]
+            assign[start:start + chunk] = np.argmin(_pairwise_distances(block, centroids, centroid_sq), axis=1)
+        return assign
+
+    def _set_lists(self, matrix, centroids, assign):
+        ids = np.argsort(assign, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=len(centroids)))))
+        self._set_layout(matrix, centroids, ids, offsets)
+
+    def _set_layout(self, matrix, centroids, ids, offsets):
+        self.centroids = centroids
+        self.ids = ids
+        self.offsets = offsets
+        # Векторы переупорядочены по спискам, чтобы каждый список был непрерывным блоком памяти
+        self.lists = np.ascontiguousarray(matrix[self.ids])
+        self.lists_sq_norms = _sq_norms(self.lists)
+
+    def build(self, matrix):
+        if not len(matrix):
+            self._set_lists(matrix, np.empty((0, matrix.shape[1]), dtype=np.float32), np.empty(0, dtype=np.int64))
+            return
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(matrix))))
+        nlist = min(nlist, len(matrix))
+        centroids = self._train(matrix, nlist)
+        self._set_lists(matrix, centroids, self._assign(matrix, centroids))
+
+    def search(self, queries, k=1):
+        """Возвращает (индексы, расстояния) формы (число запросов, k); недостающие позиции — -1 / inf"""
+        idx = np.full((len(queries), k), -1, dtype=np.int64)
+        dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if not len(self.ids) or not len(queries):
+            return idx[:, :0], dist[:, :0]
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes, _ = _top_k(_pairwise_distances(queries, self.centroids), nprobe)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            spans = [np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists]
+            positions = np.concatenate(spans)
+            if not len(positions):
+                continue
+            cand_dist = _pairwise_distances(query[None, :], self.lists[positions], self.lists_sq_norms[positions])
+            top, top_dist = _top_k(cand_dist, k)
+            idx[row, :top.shape[1]] = self.ids[positions[top[0]]]
+            dist[row, :top.shape[1]] = top_dist[0]
+        return idx, dist
+
+    def state(self):
+        return {'centroids': self.centroids, 'ids': self.ids, 'offsets': self.offsets}
+
+    def load_state(self, matrix, state):
+        self._set_layout(matrix, state['centroids'], state['ids'], state['offsets'])
+
+
+INDEX_TYPES = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_index(kind="exact", **params):
+    """Фабрика индексов по имени: 'exact' или 'ivf'"""
+    try:
+        return INDEX_TYPES[kind](**params)
+    except KeyError:
+        raise ValueError(f"Неизвестный тип индекса: {kind}") from None
+
+
+def index_path_for(database_path):
+    """Файл индекса хранится рядом с базой лиц: каталог face_db → face_db.index.npz"""
+    return os.path.splitext(os.path.normpath(database_path))[0] + ".index.npz"
+
+
+def save_index(index, path, fingerprint):
+    state = index.state()
+    if not state:
+        return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, kind=np.array(index.kind), fingerprint=np.array(fingerprint), **state)
+    os.replace(tmp_path, path)
+    return True
+
+
+def load_index(index, path, matrix, fingerprint):
+    """Восстанавливает индекс из файла; False, если файла нет или он построен для другой галереи"""
+    if not os.path.exists(path):
+        return False
+    try:
+        with np.load(path) as data:
+            if str(data['kind']) != index.kind or str(data['fingerprint']) != fingerprint:
+                return False
+            state = {key: data[key] for key in data.files if key not in ('kind', 'fingerprint')}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Не удалось загрузить индекс {path}: {e}")
+        return False
+    index.load_state(matrix, state)
+    return True
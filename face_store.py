@@ -0,0 +1,58 @@
+import threading
+import time
+
+from face_db import FaceDatabase
+
+
+class FaceStore:
+    """Потокобезопасный кеш базы лиц в памяти поверх FaceDatabase
+
+    Изменения на диске (в том числе из других процессов) проверяются не чаще раза в check_interval
+    и дочитываются инкрементально. Каждое изменение увеличивает version — по нему читатели
+    понимают, что пора обновить галерею.
+    """
+
+    def __init__(self, path, check_interval=1.0, compact_threshold=1024):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self.db = FaceDatabase(path, compact_threshold=compact_threshold)
+        self._db_stamp = self.db.stamp()
+        self._last_check = time.monotonic()
+        self.version = 1
+        print(f"Загружено {len(self.db)} известных лиц")
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            stamp = self.db.stamp()
+            if stamp == self._db_stamp:
+                return
+            self._db_stamp = stamp
+            if self.db.refresh():
+                self.version += 1
+                print(f"Загружено {len(self.db)} известных лиц")
+
+    def snapshot(self):
+        """Текущее содержимое базы: (матрица encodings, names, version)"""
+        self._refresh()
+        with self._lock:
+            encodings, names = self.db.snapshot()
+            return encodings, names, self.version
+
+    def count(self):
+        self._refresh()
+        return len(self.db)
+
+    def add(self, encoding, name, **meta):
+        """Добавление одного лица: одна запись в журнал базы"""
+        self.add_many([encoding], [name], **meta)
+
+    def add_many(self, encodings, names, **meta):
+        """Добавление пакета лиц одной транзакцией"""
+        with self._lock:
+            self.db.append(encodings, names, **meta)
+            self.version += 1
+        print(f"База сохранена: {len(self.db)} лиц")
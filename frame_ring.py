@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class FrameRef:
+    """Аренда кадра со счётчиком ссылок
+
+    Каждый, кто хранит кадр дольше вызова (оповещение, отображение, рабочий процесс),
+    берёт свою ссылку через retain() и отдаёт её через release(). Слот кольца освобождается,
+    когда ссылок не остаётся. Кадр вне кольца (slot is None) освобождает сборщик мусора.
+    """
+
+    def __init__(self, ring, slot, frame):
+        self.ring = ring
+        self.slot = slot
+        self.frame = frame
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    def retain(self):
+        if self.slot is not None:
+            self.ring._retain(self.slot)
+        return self
+
+    def release(self):
+        if self.slot is not None:
+            self.ring._release(self.slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _check_shm_space(size, path="/dev/shm"):
+    """Разделяемая память выделяется лениво: нехватка места в /dev/shm проявилась бы не здесь,
+    а падением по SIGBUS при первой записи кадра (в Docker по умолчанию /dev/shm — 64 МБ)"""
+    if not hasattr(os, "statvfs") or not os.path.isdir(path):
+        return
+    st = os.statvfs(path)
+    available = st.f_bavail * st.f_frsize
+    if available < size:
+        raise MemoryError(f"Кольцу кадров нужно {size / 2 ** 20:.0f} МБ в {path}, свободно {available / 2 ** 20:.0f} МБ: "
+                          f"увеличьте /dev/shm (docker run --shm-size) или уменьшите FRAME_MAX_SHAPE / FRAME_RING_SLOTS")
+
+
+class FrameRing:
+    """Кольцо заранее выделенных слотов под кадры (при shared=True — в разделяемой памяти)
+
+    Захват пишет кадр прямо в свободный слот, дальше детекция, отрисовка, сохранение снимков
+    и рабочие процессы читают тот же буфер без копирования. Память под слоты выделяется один
+    раз; страницы реально занимаются только при первой записи, поэтому запас по размеру кадра
+    почти ничего не стоит. Если свободных слотов нет или кадр больше max_frame_shape, кадр
+    размещается в обычной памяти (счётчик misses).
+    """
+
+    def __init__(self, slots, max_frame_shape=(2160, 3840, 3), shared=False):
+        self.slots = slots
+        self.max_frame_shape = tuple(max_frame_shape)
+        self.slot_bytes = int(np.prod(self.max_frame_shape))
+        self.shared = shared
+        self._shm = None
+        if shared:
+            _check_shm_space(self.slot_bytes * slots)
+            self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+            self._buffer = np.ndarray((self.slot_bytes * slots,), dtype=np.uint8, buffer=self._shm.buf)
+        else:
+            self._buffer = np.empty(self.slot_bytes * slots, dtype=np.uint8)
+        self._lock = threading.Lock()
+        self._refs = [0] * slots
+        self._free = deque(range(slots))
+        self.misses = 0  # Кадры, не поместившиеся в кольцо
+
+    @property
+    def name(self):
+        """Имя блока разделяемой памяти (для подключения из рабочих процессов)"""
+        return self._shm.name if self._shm else None
+
+    def fits(self, shape):
+        return int(np.prod(shape)) <= self.slot_bytes
+
+    def view(self, slot, shape):
+        """Кадр shape в слоте slot (без копирования)"""
+        offset = slot * self.slot_bytes
+        return self._buffer[offset:offset + int(np.prod(shape))].reshape(shape)
+
+    def acquire(self, shape):
+        """Свободный слот под кадр shape с одной ссылкой; содержимое не инициализировано"""
+        if self.fits(shape):
+            with self._lock:
+                if self._free:
+                    slot = self._free.popleft()
+                    self._refs[slot] = 1
+                    return FrameRef(self, slot, self.view(slot, shape))
+        with self._lock:
+            self.misses += 1
+        return FrameRef(self, None, np.empty(shape, dtype=np.uint8))
+
+    def wrap(self, frame):
+        """Копия кадра из обычной памяти в слот кольца"""
+        ref = self.acquire(frame.shape)
+        ref.frame[...] = frame
+        return ref
+
+    def _retain(self, slot):
+        with self._lock:
+            self._refs[slot] += 1
+
+    def _release(self, slot):
+        with self._lock:
+            self._refs[slot] -= 1
+            if self._refs[slot] == 0:
+                self._free.append(slot)
+
+    def stats(self):
+        with self._lock:
+            return {'slots': self.slots, 'free': len(self._free), 'misses': self.misses}
+
+    def close(self):
+        if self._shm:
+            self._buffer = None
+            try:
+                self._shm.close()
+            except BufferError:
+                pass  # Кто-то ещё держит кадр: память освободится при выходе процесса
+            self._shm.unlink()
+            self._shm = None
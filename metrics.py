@@ -0,0 +1,126 @@
+import bisect
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм времени, сек: от долей миллисекунды (поиск по галерее) до секунд (детекция 4K)
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина — больше всех границ (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, label_names, values):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            labels = _format_labels(label_names, values, [("le", _format_value(float(bound)))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(label_names, values)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+class Histogram:
+    """Распределение значений по корзинам: observe() — поиск корзины и три сложения под блокировкой
+
+    Значения для каждого набора меток хранятся в отдельном дочернем объекте.
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Дочерняя гистограмма для значений меток (её можно сохранить и обновлять без поиска)"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name}: ожидаются метки {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramValue(self.buckets))
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.label_names, values))
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик в текстовом формате Prometheus
+
+    Гистограммы времени этапов обновляются при обработке кадра. Счётчики и текущие значения,
+    которые и так считаются в компонентах (кадры, лица, очереди, кольцо кадров, статистика потоков),
+    читаются только при запросе /metrics через collectors и ничего не стоят между запросами.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.collectors = []  # collector() → [(имя, тип, описание, [(словарь меток, значение), ...]), ...]
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=TIME_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"❌ Ошибка сбора метрик: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_format_labels(names, [labels[key] for key in names])} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+
+def merge_boxes(boxes):
+    """Объединение пересекающихся прямоугольников (top, right, bottom, left)"""
+    boxes = list(boxes)
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        result = []
+        while boxes:
+            top, right, bottom, left = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                t, r, b, l = boxes[i]
+                if l <= right and r >= left and t <= bottom and b >= top:
+                    top, right, bottom, left = min(top, t), max(right, r), max(bottom, b), min(left, l)
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            result.append((top, right, bottom, left))
+        boxes = result
+    return boxes
+
+
+class MotionDetector:
+    """Дешёвый детектор движения перед детекцией лиц
+
+    Кадр уменьшается до width пикселей по ширине, переводится в оттенки серого и сравнивается
+    с фоном (скользящее среднее). Возвращает области движения в координатах исходного кадра,
+    расширенные на margin, чтобы лицо целиком попадало в область.
+    """
+
+    def __init__(self, width=160, threshold=25, min_area=0.002, learning_rate=0.05, margin=0.15):
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area  # Минимальная площадь области движения, доля кадра
+        self.learning_rate = learning_rate
+        self.margin = margin
+        self.background = None
+        self._small = None  # Переиспользуемые буферы уменьшенного кадра
+        self._gray = None
+        self._blurred = None
+
+    def detect(self, frame):
+        """Список областей движения (top, right, bottom, left); пустой — сцена статична"""
+        height, width = frame.shape[:2]
+        scale = self.width / width
+        small_shape = (max(1, int(height * scale)), self.width)
+        if self._small is None or self._small.shape[:2] != small_shape:
+            self._small = np.empty(small_shape + frame.shape[2:], dtype=np.uint8)
+            self._gray = np.empty(small_shape, dtype=np.uint8)
+            self._blurred = np.empty(small_shape, dtype=np.uint8)
+        small = cv2.resize(frame, (self.width, small_shape[0]), dst=self._small, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0, dst=self._blurred)
+
+        if self.background is None or self.background.shape != gray.shape:
+            # Первый кадр: фона ещё нет, весь кадр считается областью движения
+            self.background = gray.astype(np.float32)
+            return [(0, width, height, 0)]
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]  # OpenCV 3 и 4
+
+        min_area = self.min_area * mask.shape[0] * mask.shape[1]
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            pad_x, pad_y = w * self.margin, h * self.margin
+            boxes.append((
+                max(0, int((y - pad_y) / scale)),
+                min(width, int((x + w + pad_x) / scale)),
+                min(height, int((y + h + pad_y) / scale)),
+                max(0, int((x - pad_x) / scale)),
+            ))
+        return merge_boxes(boxes)
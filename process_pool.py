@@ -0,0 +1,140 @@
+import itertools
+import multiprocessing
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _worker_main(shm_name, slot_bytes, task_queue, result_queue):
+    """Рабочий процесс: детекция и encoding лиц по кадрам из разделяемой памяти"""
+    from detection import detect_faces, encode_locations
+
+    # Рабочие процессы используют resource_tracker главного процесса: удаляет память только он
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            task_id, op, slot, shape, args = task
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            try:
+                if op == 'detect':
+                    result = [location for location, _, _ in detect_faces(frame, args['regions'], **args['options'])]
+                else:
+                    result = encode_locations(frame, args['locations'])
+                result_queue.put((task_id, True, result))
+            except Exception as e:
+                result_queue.put((task_id, False, f"{type(e).__name__}: {e}"))
+            finally:
+                del frame
+    finally:
+        shm.close()
+
+
+class ProcessRecognitionBackend:
+    """Детекция и encoding лиц в пуле процессов вне GIL главного процесса
+
+    Захват декодирует кадры прямо в кольцо FrameRing в разделяемой памяти, рабочие процессы
+    читают их оттуда без копирования и сериализации. Через очереди передаются только номер
+    слота, рамки и encodings. Главный процесс занимается захватом, трекингом, поиском
+    в галерее, оповещениями и веб-сервером.
+
+    Пока процесс не ответил на задачу, она держит свою ссылку на слот кадра: даже после
+    таймаута ожидания захват не перезапишет кадр, который процесс ещё читает.
+    """
+
+    def __init__(self, ring, workers=2, timeout=30.0):
+        if not ring.shared:
+            raise ValueError("Для пула процессов нужно кольцо кадров в разделяемой памяти (shared=True)")
+        self.ring = ring
+        self.timeout = timeout  # Ожидание результата задачи, сек (защита от зависшего процесса)
+
+        # spawn, а не fork: к этому моменту в главном процессе уже могут работать потоки,
+        # и их захваченные блокировки не должны попасть в рабочие процессы
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._futures = {}  # task_id → (Future или None, если результат уже не ждут; ссылка на кадр)
+        self._futures_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._processes = [
+            ctx.Process(target=_worker_main, args=(ring.name, ring.slot_bytes, self._tasks, self._results),
+                        name=f"recognition-process-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+        self._collector = threading.Thread(target=self._collect_results, name="process-results", daemon=True)
+        self._collector.start()
+
+    def share(self, frame_ref):
+        """Ссылка на кадр в кольце, видимом рабочим процессам, или None
+
+        Кадр из кольца передаётся как есть (ещё одна ссылка), кадр вне кольца копируется в
+        свободный слот. None — кадр в кольцо не помещается, его нужно обработать на месте.
+        """
+        if frame_ref.ring is self.ring and frame_ref.slot is not None:
+            return frame_ref.retain()
+        shared = self.ring.wrap(frame_ref.frame)
+        if shared.slot is None:
+            return None
+        return shared
+
+    def _submit(self, op, frame_ref, args):
+        task_id = next(self._ids)
+        future = Future()
+        with self._futures_lock:
+            self._futures[task_id] = (future, frame_ref.retain())
+        self._tasks.put((task_id, op, frame_ref.slot, frame_ref.shape, args))
+        return self._wait(task_id, future)
+
+    def _wait(self, task_id, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            # Результат больше не нужен, но слот кадра освободится только с ответом процесса
+            with self._futures_lock:
+                entry = self._futures.get(task_id)
+                if entry is not None:
+                    self._futures[task_id] = (None, entry[1])
+            raise
+
+    def _collect_results(self):
+        while True:
+            try:
+                task_id, ok, result = self._results.get()
+            except (EOFError, OSError):
+                break
+            with self._futures_lock:
+                future, frame_ref = self._futures.pop(task_id, (None, None))
+            if frame_ref is not None:
+                frame_ref.release()
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def detect(self, frame_ref, regions, options):
+        """Рамки лиц на кадре из кольца"""
+        return self._submit('detect', frame_ref, {'regions': regions, 'options': options})
+
+    def encode(self, frame_ref, locations):
+        """Encodings лиц по рамкам на кадре из кольца"""
+        if not locations:
+            return []
+        return list(self._submit('encode', frame_ref, {'locations': locations}))
+
+    def stop(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        with self._futures_lock:
+            entries, self._futures = list(self._futures.values()), {}
+        for _, frame_ref in entries:
+            frame_ref.release()
@@ -0,0 +1,80 @@
+import collections
+import threading
+import time
+
+
+class AdaptiveScheduler:
+    """Частота анализа кадров одной камеры вместо фиксированного пропуска кадров и пауз
+
+    Целевая частота зависит от активности сцены:
+      * лица были в кадре за последние active_hold секунд — max_fps;
+      * после последнего лица или движения прошло меньше idle_after секунд — idle_fps;
+      * сцена давно статична — heartbeat_fps (редкая контрольная проверка).
+    Сверху частота ограничена бюджетом CPU: cpu_share секунд процессорного времени в секунду,
+    делённые на измеренную стоимость анализа одного кадра.
+    """
+
+    def __init__(self, cpu_share=1.0, max_fps=10.0, idle_fps=2.0, heartbeat_fps=0.5,
+                 active_hold=5.0, idle_after=30.0):
+        self.cpu_share = cpu_share
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.heartbeat_fps = heartbeat_fps
+        self.active_hold = active_hold
+        self.idle_after = idle_after
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self.cost = 0.0  # Экспоненциальное среднее времени анализа кадра, сек
+        self.last_analysis = 0.0
+        self.last_faces = 0.0
+        self.last_activity = now  # Последнее лицо или движение в кадре
+        self._history = collections.deque()  # Моменты анализа за последние 10 секунд
+
+    def target_fps(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now - self.last_faces < self.active_hold:
+            fps = self.max_fps
+        elif now - self.last_activity < self.idle_after:
+            fps = self.idle_fps
+        else:
+            fps = self.heartbeat_fps
+
+        if self.cost > 0:
+            fps = min(fps, self.cpu_share / self.cost)
+        return max(fps, self.heartbeat_fps)
+
+    def should_analyse(self, now=None):
+        """Пора ли анализировать очередной кадр"""
+        now = time.monotonic() if now is None else now
+        return now - self.last_analysis >= 1.0 / self.target_fps(now)
+
+    def note_activity(self, now=None):
+        """Признак активности сцены без лиц (например, движение) — выход из режима heartbeat"""
+        self.last_activity = time.monotonic() if now is None else now
+
+    def record(self, cost, faces, now=None):
+        """Результат анализа кадра: затраченное время и число найденных лиц"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.cost = cost if self.cost == 0 else 0.8 * self.cost + 0.2 * cost
+            self.last_analysis = now
+            if faces:
+                self.last_faces = now
+                self.last_activity = now
+            self._history.append(now)
+            while self._history and now - self._history[0] > 10.0:
+                self._history.popleft()
+
+    def achieved_fps(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            recent = [t for t in self._history if now - t <= 10.0]
+        return len(recent) / 10.0
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'target_fps': round(self.target_fps(now), 2),
+            'achieved_fps': round(self.achieved_fps(now), 2),
+            'analysis_cost_ms': round(self.cost * 1000, 1),
+        }
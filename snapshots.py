@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cv2
+
+
+def _safe_name(name):
+    """Имя человека как часть имени файла (без разделителей пути и спецсимволов)"""
+    return re.sub(r'[^\w-]+', '_', name).strip('_')[:40] or 'face'
+
+
+class SnapshotStore:
+    """Снимки оповещений: кроп лица и миниатюра для дашборда, полный кадр — по желанию
+
+    Вместо полного кадра на каждое оповещение сохраняется кроп вокруг лица (margin — поля,
+    доля размера лица) и миниатюра не больше thumb_size пикселей. Качество JPEG задаётся
+    отдельно для каждого вида. Фоновая очистка удаляет снимки старше max_age_days и самые
+    старые снимки, пока каталог не станет меньше max_total_mb.
+    """
+
+    def __init__(self, directory, margin=0.6, quality=85, thumb_size=320, thumb_quality=70,
+                 save_full_frame=False, full_quality=80, max_age_days=30, max_total_mb=2048):
+        self.directory = directory
+        self.margin = margin
+        self.quality = quality
+        self.thumb_size = thumb_size
+        self.thumb_quality = thumb_quality
+        self.save_full_frame = save_full_frame
+        self.full_quality = full_quality
+        self.max_age_days = max_age_days
+        self.max_total_mb = max_total_mb
+        self.saved = 0
+        self.bytes_written = 0
+        self.removed = 0
+        os.makedirs(directory, exist_ok=True)
+        self._cleanup_thread = None
+
+    def _write(self, filename, image, quality):
+        ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+        if not ok:
+            raise RuntimeError(f"Не удалось закодировать {filename}")
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(data.tobytes())
+        self.bytes_written += len(data)
+        return filename
+
+    def crop(self, frame, location):
+        """Кроп кадра вокруг лица (top, right, bottom, left) с полями margin"""
+        top, right, bottom, left = location
+        pad = int(max(bottom - top, right - left) * self.margin)
+        height, width = frame.shape[:2]
+        return frame[max(0, top - pad):min(height, bottom + pad), max(0, left - pad):min(width, right + pad)]
+
+    def save(self, frame, location, name):
+        """Сохранение снимков оповещения; возвращает имена файлов: image_path (кроп), thumb_path, frame_path"""
+        prefix = f"{_safe_name(name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        face = self.crop(frame, location) if location else frame
+
+        scale = self.thumb_size / max(face.shape[:2])
+        thumb = cv2.resize(face, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else face
+
+        paths = {
+            'image_path': self._write(f"{prefix}_face.jpg", face, self.quality),
+            'thumb_path': self._write(f"{prefix}_thumb.jpg", thumb, self.thumb_quality),
+            'frame_path': None,
+        }
+        if self.save_full_frame:
+            paths['frame_path'] = self._write(f"{prefix}_frame.jpg", frame, self.full_quality)
+        self.saved += 1
+        return paths
+
+    def cleanup(self):
+        """Удаление снимков старше max_age_days и самых старых сверх max_total_mb"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.lower().endswith('.jpg'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        limit = self.max_total_mb * 1024 * 1024 if self.max_total_mb else None
+        removed = 0
+        for mtime, size, path in files:
+            expired = self.max_age_days and now - mtime > self.max_age_days * 86400
+            if not expired and (limit is None or total <= limit):
+                break  # Файлы отсортированы по времени: остальные новее и укладываются в лимит
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            self.removed += removed
+            print(f"🧹 Удалено старых снимков: {removed}")
+        return removed
+
+    def start_cleanup(self, interval=600):
+        """Фоновая очистка раз в interval секунд"""
+        if self._cleanup_thread:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.cleanup()
+                except Exception as e:
+                    print(f"❌ Ошибка очистки снимков: {e}")
+                time.sleep(interval)
+
+        self._cleanup_thread = threading.Thread(target=run, name="snapshot-cleanup", daemon=True)
+        self._cleanup_thread.start()
+
+    def stats(self):
+        return {'saved': self.saved, 'bytes_written': self.bytes_written, 'removed': self.removed}
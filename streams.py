@@ -0,0 +1,520 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import cv2
+
+from frame_ring import FrameRef
+
+
+class LatestFrameBuffer:
+    """Слот на один кадр: новый кадр вытесняет непрочитанный старый, очередь не накапливается
+
+    Хранит FrameRef; вытесненный кадр освобождается (его слот кольца возвращается захвату).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._captured_at = 0.0
+        self.frames_read = 0
+        self.frames_dropped = 0  # Кадры, вытесненные до того, как их успели обработать
+
+    def put(self, frame_ref, captured_at):
+        with self._lock:
+            dropped, self._frame = self._frame, frame_ref
+            if dropped is not None:
+                self.frames_dropped += 1
+            self._captured_at = captured_at
+            self.frames_read += 1
+        if dropped is not None:
+            dropped.release()
+
+    def count(self):
+        """Кадр передан получателю напрямую, минуя слот (учитывается в frames_read)"""
+        with self._lock:
+            self.frames_read += 1
+
+    def take(self):
+        """Самый свежий кадр (FrameRef, освобождает получатель) и время его захвата (time.monotonic) или (None, None)"""
+        with self._lock:
+            frame, self._frame = self._frame, None
+            return (frame, self._captured_at) if frame is not None else (None, None)
+
+    def has_frame(self):
+        return self._frame is not None
+
+
+# Бэкенды захвата OpenCV
+BACKENDS = {
+    "any": cv2.CAP_ANY,
+    "ffmpeg": cv2.CAP_FFMPEG,
+    "gstreamer": cv2.CAP_GSTREAMER,
+}
+
+
+def configure_ffmpeg(transport=None, **options):
+    """Параметры FFmpeg для всех камер процесса (OPENCV_FFMPEG_CAPTURE_OPTIONS)
+
+    transport — "tcp" или "udp" для RTSP; options — другие параметры FFmpeg (например, buffer_size).
+    OpenCV читает их при каждом подключении, поэтому вызывать нужно до запуска захвата.
+    """
+    if transport:
+        options = dict(rtsp_transport=transport, **options)
+    if options:
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "|".join(f"{key};{value}" for key, value in options.items())
+
+
+# Состояния потока камеры
+CONNECTING = "connecting"  # Идёт подключение
+LIVE = "live"  # Кадры поступают
+STALLED = "stalled"  # Подключение есть, но кадры не приходят или картинка застыла
+DOWN = "down"  # Подключение потеряно, ожидание перед повторной попыткой
+
+
+class CameraStream:
+    """Захват одной камеры: непрерывно читает поток и хранит только последний кадр
+
+    Обработчик всегда берёт самый свежий кадр, поэтому при медленной обработке кадры
+    пропускаются, а не копятся в буфере — оповещения соответствуют текущей картинке.
+
+    Подключение и чтение ограничены таймаутами (open_timeout, read_timeout). После ошибки
+    повторная попытка откладывается с экспоненциальным ростом задержки от reconnect_delay до
+    max_reconnect_delay и случайным разбросом, чтобы «мигающая» камера не вызывала шквал
+    переподключений; задержка сбрасывается, когда поток проработал stable_time секунд.
+    Зависание захвата обнаруживает watch() (его вызывает StreamSupervisor): если кадров нет
+    дольше stall_timeout или картинка не меняется дольше freeze_timeout (0 — не проверять), поток помечается
+    stalled, а через restart_timeout захват перезапускается в новом потоке — зависший вызов
+    OpenCV не держит ни эту камеру, ни остальные. Повторные перезапуски откладываются с той же
+    экспоненциальной задержкой, а пока max_stuck_captures прежних потоков ещё не вернулись
+    из OpenCV, новые не запускаются: зависающая камера не копит потоки и подключения.
+
+    Если задан should_retrieve и он возвращает False, кадр только принимается (grab) без
+    преобразования в изображение и копирования в кольцо — такие кадры всё равно не анализировались бы.
+    """
+
+    def __init__(self, camera_id, url, reconnect_delay=1.0, ring=None, max_reconnect_delay=60.0,
+                 open_timeout=10.0, read_timeout=10.0, stall_timeout=5.0, freeze_timeout=30.0,
+                 restart_timeout=20.0, stable_time=10.0, backend="any", max_stuck_captures=2):
+        self.camera_id = camera_id
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.stall_timeout = stall_timeout
+        self.freeze_timeout = freeze_timeout
+        self.restart_timeout = restart_timeout
+        self.stable_time = stable_time
+        self.max_stuck_captures = max_stuck_captures
+        self.ring = ring  # FrameRing: кадры декодируются прямо в его слоты
+        self.backend = BACKENDS[backend]
+        self._shape = None
+        self.running = False
+        self.should_retrieve = None  # should_retrieve() → нужен ли следующий кадр как изображение
+        self.frames_skipped = 0  # Кадры, принятые без retrieve
+        self.on_frame = None  # Вызывается после каждого нового кадра (будит пул обработки)
+        self.on_decode = None  # on_decode(camera_id, секунды): время чтения и декодирования кадра (метрики)
+        self.reconnects = 0
+        self.restarts = 0  # Перезапусков зависшего захвата
+        self.state = CONNECTING
+        self.state_since = time.monotonic()
+        self.last_error = None
+        self.last_frame_at = None  # time.monotonic() последнего кадра
+        self._failures = 0  # Неудачных подключений подряд (для задержки)
+        self._live_since = None
+        self._signature = None  # Грубый отпечаток картинки для обнаружения застывшего потока
+        self._changed_at = None  # Когда отпечаток последний раз изменился
+        self._checked_at = None  # Когда отпечаток последний раз проверялся
+        self._generation = 0  # Номер текущего потока захвата; устаревшие потоки завершаются сами
+        self._captures = 0  # Потоков захвата, ещё не завершившихся (текущий и зависшие прежние)
+        self._restart_after = 0.0  # Раньше этого времени (time.monotonic) перезапуск не выполняется
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.buffer = LatestFrameBuffer()
+        self.frames_processed = 0
+        self.last_latency = 0.0  # Задержка от захвата кадра до конца его обработки, сек
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+
+    def has_frame(self):
+        return self.buffer.has_frame()
+
+    def pop_frame(self):
+        """Самый свежий непрочитанный кадр (FrameRef) и время его захвата"""
+        return self.buffer.take()
+
+    def record_latency(self, latency):
+        self.frames_processed += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        # Экспоненциальное среднее: устойчиво к единичным выбросам
+        self.avg_latency = latency if self.frames_processed == 1 else 0.9 * self.avg_latency + 0.1 * latency
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'camera_id': self.camera_id,
+            'state': self.state,
+            'state_seconds': round(now - self.state_since, 1),
+            'last_frame_age': round(now - self.last_frame_at, 1) if self.last_frame_at else None,
+            'last_error': self.last_error,
+            'frames_read': self.buffer.frames_read,
+            'frames_dropped': self.buffer.frames_dropped,
+            'frames_skipped': self.frames_skipped,
+            'frames_processed': self.frames_processed,
+            'reconnects': self.reconnects,
+            'restarts': self.restarts,
+            'stuck_captures': max(0, self._captures - 1),
+            'latency_ms': round(self.last_latency * 1000, 1),
+            'avg_latency_ms': round(self.avg_latency * 1000, 1),
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+        }
+
+    def _set_state(self, state, error=None):
+        with self._lock:
+            if state != self.state:
+                self.state = state
+                self.state_since = time.monotonic()
+            if error:
+                self.last_error = error
+
+    def _open(self):
+        params = []
+        if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            # Без таймаутов недоступная камера может держать подключение минутами (OpenCV 4.6+)
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)]
+        cap = cv2.VideoCapture(self.url, self.backend, params) if params else cv2.VideoCapture(self.url, self.backend)
+        # Внутренний буфер OpenCV тоже держим минимальным (поддерживается не всеми бэкендами)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _read(self, cap):
+        """Чтение кадра; при известном размере кадра — сразу в слот кольца, без копирования"""
+        if self.ring is None or self._shape is None:
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            self._shape = frame.shape
+            return self.ring.wrap(frame) if self.ring else FrameRef(None, None, frame)
+
+        frame_ref = self.ring.acquire(self._shape)
+        ret, frame = cap.read(frame_ref.frame)
+        if not ret:
+            frame_ref.release()
+            return None
+        if frame is not frame_ref.frame:
+            # Размер кадра изменился: OpenCV выделил новый массив
+            frame_ref.release()
+            self._shape = frame.shape
+            return self.ring.wrap(frame)
+        return frame_ref
+
+    def backoff(self):
+        """Задержка перед следующим подключением: экспоненциальный рост и случайный разброс"""
+        delay = min(self.max_reconnect_delay, self.reconnect_delay * 2 ** max(0, self._failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _current(self, generation):
+        return self.running and generation == self._generation
+
+    def _frame_read(self, frame_ref):
+        now = time.monotonic()
+        # Отпечаток — каждый 32-й пиксель: застывший кодер отдаёт один и тот же кадр
+        signature = hash(frame_ref.frame[::32, ::32].tobytes())
+        if signature != self._signature:
+            self._signature = signature
+            self._changed_at = now
+        self._checked_at = now
+        self._alive(now)
+
+    def _alive(self, now):
+        """Кадр получен (с изображением или без)"""
+        self.last_frame_at = now
+        if self.state != LIVE and not self._frozen():
+            if self.state == STALLED:
+                print(f"✅ [{self.camera_id}] Кадры снова поступают")
+            self._set_state(LIVE)
+        if self._failures and now - self._live_since >= self.stable_time:
+            self._failures = 0
+
+    def _frozen(self):
+        # Сравниваются только кадры с изображением: пропущенные через grab не проверяются
+        if not self.freeze_timeout or self._signature is None:
+            return False
+        return self._checked_at - self._changed_at > self.freeze_timeout
+
+    def _fail(self, generation, error):
+        """Подключение потеряно: ожидание перед повторной попыткой (прерывается остановкой)"""
+        if not self._current(generation):
+            return
+        self._failures += 1
+        self.reconnects += 1
+        delay = self.backoff()
+        self._set_state(DOWN, error)
+        print(f"⚠️ [{self.camera_id}] {error}, повторное подключение через {delay:.1f} с")
+        self._wakeup.wait(delay)
+
+    def _capture(self, generation):
+        try:
+            self._capture_loop(generation)
+        finally:
+            with self._lock:
+                self._captures -= 1
+
+    def _capture_loop(self, generation):
+        while self._current(generation):
+            self._set_state(CONNECTING)
+            cap = self._open()
+            if not self._current(generation):
+                cap.release()
+                return
+            if not cap.isOpened():
+                cap.release()
+                self._fail(generation, f"Ошибка подключения к потоку: {self.url}")
+                continue
+
+            print(f"✅ [{self.camera_id}] Подключение установлено")
+            self._live_since = time.monotonic()
+            self._signature = None  # Застывание отсчитывается заново для нового подключения
+            while self._current(generation) and self._step(cap, generation):
+                pass
+            cap.release()
+            self._fail(generation, "Ошибка чтения кадра")
+
+    def _step(self, cap, generation):
+        """Приём одного кадра; False — ошибка чтения"""
+        if self.should_retrieve and not self.should_retrieve():
+            if not cap.grab():
+                return False
+            if not self._current(generation):
+                return False  # Захват уже перезапущен: зависший поток не должен менять состояние
+            self.frames_skipped += 1
+            self._alive(time.monotonic())
+            return True
+
+        start = time.perf_counter()
+        frame_ref = self._read(cap)
+        if frame_ref is None:
+            return False
+        if not self._current(generation):
+            frame_ref.release()  # Захват уже перезапущен: кадр из зависшего потока не нужен
+            return False
+        if self.on_decode:
+            self.on_decode(self.camera_id, time.perf_counter() - start)
+        self._frame_read(frame_ref)
+        self._deliver(frame_ref)
+        return True
+
+    def _deliver(self, frame_ref):
+        self.buffer.put(frame_ref, time.monotonic())
+        if self.on_frame:
+            self.on_frame()
+
+    def _spawn(self):
+        with self._lock:
+            self._generation += 1
+            self._captures += 1
+            generation = self._generation
+        threading.Thread(target=self._capture, args=(generation,),
+                         name=f"capture-{self.camera_id}-{generation}", daemon=True).start()
+
+    def start(self):
+        self.running = True
+        self._spawn()
+
+    def restart(self):
+        """Новый поток захвата; прежний (возможно, зависший в OpenCV) завершится, когда вернёт управление"""
+        self.restarts += 1
+        self._failures += 1
+        self._restart_after = time.monotonic() + self.restart_timeout + self.backoff()
+        self._set_state(CONNECTING)
+        self._wakeup.set()
+        self._wakeup = threading.Event()
+        self._spawn()
+
+    def watch(self, now=None):
+        """Проверка сторожем: нет кадров или застывшая картинка → stalled, долго stalled → перезапуск"""
+        if not self.running:
+            return
+        now = time.monotonic() if now is None else now
+        state, since = self.state, self.state_since
+        if state == LIVE:
+            if now - self.last_frame_at > self.stall_timeout:
+                print(f"⚠️ [{self.camera_id}] Нет кадров {now - self.last_frame_at:.0f} с")
+                self._set_state(STALLED, "Нет кадров")
+            elif self._frozen():
+                print(f"⚠️ [{self.camera_id}] Картинка не меняется {now - self._changed_at:.0f} с")
+                self._set_state(STALLED, "Картинка не меняется")
+        elif state in (CONNECTING, STALLED) and now - since > self.restart_timeout and now >= self._restart_after:
+            if self._captures > self.max_stuck_captures:
+                self._restart_after = now + self.restart_timeout
+                print(f"⚠️ [{self.camera_id}] Захват завис ({state}), но {self._captures - 1} прежних потоков "
+                      f"ещё не вернулись из OpenCV — перезапуск отложен")
+                return
+            print(f"🔁 [{self.camera_id}] Захват завис ({state}), перезапуск")
+            self.restart()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+
+class OnDemandStream(CameraStream):
+    """Поток, кадры которого нужны изредка: основной поток камеры для качественных снимков
+
+    Детекция идёт по субпотоку низкого разрешения, а кадр основного потока нужен только для
+    кропа найденного лица. Кадры принимаются непрерывно (grab) — соединение не простаивает,
+    и следующий кадр доступен сразу, — а в изображение преобразуется только кадр, запрошенный fetch().
+    grab() при этом всё равно декодирует каждый кадр основного потока: экономится детекция
+    и копирование, но не декодирование.
+
+    frames_read — кадры, отданные fetch(); задержка — время от запроса до получения кадра.
+    """
+
+    def __init__(self, camera_id, url, **params):
+        super().__init__(camera_id, url, **params)
+        self._requests = []
+        self.should_retrieve = self._requested
+
+    def _requested(self):
+        return bool(self._requests)
+
+    def fetch(self, timeout=1.0):
+        """Ближайший кадр потока (FrameRef, освобождает получатель) или None, если поток не работает или не успел"""
+        if self.state != LIVE:
+            return None
+        future = Future()
+        start = time.monotonic()
+        with self._lock:
+            self._requests.append(future)
+        try:
+            frame_ref = future.result(timeout)
+        except FutureTimeout:
+            with self._lock:
+                if future in self._requests:
+                    # Запрос снимается, чтобы следующий кадр не преобразовывался впустую
+                    self._requests.remove(future)
+                    return None
+            frame_ref = future.result()  # Кадр уже передаётся
+        self.record_latency(time.monotonic() - start)
+        return frame_ref
+
+    def _deliver(self, frame_ref):
+        with self._lock:
+            requests, self._requests = self._requests, []
+        if requests:
+            self.buffer.count()
+        for future in requests:
+            future.set_result(frame_ref.retain())
+        frame_ref.release()
+
+
+class StreamSupervisor:
+    """Сторож потоков камер: раз в interval секунд вызывает watch() каждого потока"""
+
+    def __init__(self, streams, interval=1.0):
+        self.streams = list(streams)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for stream in self.streams:
+                try:
+                    stream.watch()
+                except Exception as e:
+                    print(f"❌ [{stream.camera_id}] Ошибка проверки потока: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stream-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class StreamWorkerPool:
+    """Общий пул обработчиков для всех камер со справедливой очередностью
+
+    Камеры обходятся по кругу, и каждая обрабатывается не более чем одним потоком одновременно:
+    нагруженная камера не вытесняет остальные, а состояние камеры не требует блокировок.
+    """
+
+    def __init__(self, streams, handler, workers=4):
+        self.streams = list(streams)
+        self.handler = handler  # handler(camera_id, frame_ref); ссылку после вызова освобождает пул
+        self.workers = workers
+        self.running = False
+        self._cond = threading.Condition()
+        self._busy = set()
+        self._next = 0
+        self._threads = []
+        self.supervisor = StreamSupervisor(self.streams)
+        for stream in self.streams:
+            stream.on_frame = self._notify
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            while self.running:
+                count = len(self.streams)
+                for offset in range(count):
+                    idx = (self._next + offset) % count
+                    stream = self.streams[idx]
+                    if stream.camera_id in self._busy or not stream.has_frame():
+                        continue
+                    frame_ref, captured_at = stream.pop_frame()
+                    if frame_ref is None:
+                        continue
+                    self._busy.add(stream.camera_id)
+                    self._next = idx + 1
+                    return stream, frame_ref, captured_at
+                self._cond.wait(timeout=0.5)
+        return None, None, None
+
+    def _work(self):
+        while self.running:
+            stream, frame_ref, captured_at = self._take()
+            if stream is None:
+                continue
+            try:
+                self.handler(stream.camera_id, frame_ref)
+                stream.record_latency(time.monotonic() - captured_at)
+            except Exception as e:
+                print(f"❌ [{stream.camera_id}] Ошибка обработки кадра: {e}")
+            finally:
+                frame_ref.release()
+                with self._cond:
+                    self._busy.discard(stream.camera_id)
+                    self._cond.notify()
+
+    def stats(self):
+        """Счётчики всех камер: прочитано, пропущено, обработано кадров и задержка"""
+        return [stream.stats() for stream in self.streams]
+
+    def start(self):
+        self.running = True
+        for stream in self.streams:
+            stream.start()
+        self.supervisor.start()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"recognition-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        self.supervisor.stop()
+        for stream in self.streams:
+            stream.stop()
+        with self._cond:
+            self._cond.notify_all()
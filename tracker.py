@@ -0,0 +1,111 @@
+import itertools
+
+
+def box_iou(a, b):
+    """IoU двух прямоугольников (top, right, bottom, left)"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if not inter:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centroid_shift(a, b):
+    """Смещение центров, нормированное на размер лица"""
+    ay, ax = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    by, bx = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    size = max(a[1] - a[3], a[2] - a[0], 1)
+    return ((ay - by) ** 2 + (ax - bx) ** 2) ** 0.5 / size
+
+
+class Track:
+    """Лицо, прослеженное через несколько кадров"""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.created_at = now
+        self.last_seen = now
+        self.name = None  # None — ещё не распознавалось
+        self.distance = None
+        self.identified_at = 0.0
+        self.match_iou = 1.0  # Насколько уверенно трек сопоставлен на последнем кадре
+        self.alerted_name = None
+        self.alerted_at = 0.0
+
+
+class FaceTracker:
+    """Лёгкий IoU/центроидный трекер лиц одной камеры
+
+    Трек получает стабильный ID; повторное распознавание (encoding + поиск в галерее) нужно
+    только для нового трека, раз в reid_interval секунд, при неуверенном совпадении с галереей
+    и при резком скачке рамки.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_shift=0.75, max_age=3.0,
+                 reid_interval=5.0, uncertain_margin=0.05, uncertain_interval=1.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_shift = max_centroid_shift
+        self.max_age = max_age  # Сколько секунд трек живёт без подтверждения детектором
+        self.reid_interval = reid_interval
+        self.uncertain_margin = uncertain_margin  # Расстояние ближе этого к порогу — неуверенное совпадение
+        self.uncertain_interval = uncertain_interval
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, now):
+        """Сопоставляет рамки кадра с треками; возвращает треки в порядке boxes"""
+        # Жадное сопоставление по IoU, затем по смещению центров для быстро движущихся лиц
+        pairs = []
+        for i, box in enumerate(boxes):
+            for track in self.tracks.values():
+                iou = box_iou(box, track.box)
+                if iou >= self.iou_threshold:
+                    pairs.append((1.0 + iou, i, track))
+                else:
+                    shift = _centroid_shift(track.box, box)
+                    if shift <= self.max_centroid_shift:
+                        pairs.append((1.0 - shift, i, track))
+        pairs.sort(key=lambda p: p[0], reverse=True)
+
+        result = [None] * len(boxes)
+        used = set()
+        for score, i, track in pairs:
+            if result[i] is not None or track.track_id in used:
+                continue
+            used.add(track.track_id)
+            track.match_iou = box_iou(boxes[i], track.box)
+            track.box = boxes[i]
+            track.last_seen = now
+            result[i] = track
+
+        for i, box in enumerate(boxes):
+            if result[i] is None:
+                track = Track(next(self._ids), box, now)
+                self.tracks[track.track_id] = track
+                result[i] = track
+
+        for track_id in [t for t, track in self.tracks.items() if now - track.last_seen > self.max_age]:
+            del self.tracks[track_id]
+        return result
+
+    def needs_identification(self, track, now, tolerance):
+        if track.name is None:
+            return True
+        age = now - track.identified_at
+        if age >= self.reid_interval:
+            return True
+        if track.match_iou < 0.5:
+            return True  # Рамка резко сместилась: возможно, это уже другой человек
+        if track.distance is not None and abs(track.distance - tolerance) < self.uncertain_margin:
+            return age >= self.uncertain_interval
+        return False
+
+    def set_identity(self, track, name, distance, now):
+        track.name = name
+        track.distance = distance
+        track.identified_at = now
+        track.match_iou = 1.0
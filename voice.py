@@ -0,0 +1,247 @@
+import abc
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+
+
+class TTSEngine(abc.ABC):
+    """Движок синтеза речи: synthesize(text, path) записывает аудиофайл в path"""
+
+    name = "base"
+    extension = "mp3"
+
+    @abc.abstractmethod
+    def synthesize(self, text, path):
+        """Синтез фразы в файл; исключение — синтез не удался"""
+
+    def cache_key(self):
+        """Параметры движка, от которых зависит звучание (входят в имя файла кеша)"""
+        return self.name
+
+
+class GTTSEngine(TTSEngine):
+    """Google TTS (нужен интернет); timeout ограничивает сетевой запрос"""
+
+    name = "gtts"
+    extension = "mp3"
+
+    def __init__(self, lang="ru", timeout=10.0):
+        from gtts import gTTS
+        self._gtts = gTTS
+        self.lang = lang
+        self.timeout = timeout
+
+    def synthesize(self, text, path):
+        self._gtts(text=text, lang=self.lang, timeout=self.timeout).save(path)
+
+    def cache_key(self):
+        return f"{self.name}-{self.lang}"
+
+
+# Синтез pyttsx3 в отдельном процессе: зависший runAndWait() завершается по таймауту
+_PYTTSX3_SCRIPT = """
+import sys, pyttsx3
+text, path, voice, rate = sys.argv[1:5]
+engine = pyttsx3.init()
+if voice:
+    engine.setProperty('voice', voice)
+if rate:
+    engine.setProperty('rate', int(rate))
+engine.save_to_file(text, path)
+engine.runAndWait()
+"""
+
+
+class Pyttsx3Engine(TTSEngine):
+    """Локальный синтез через pyttsx3 (SAPI5 / NSSpeechSynthesizer / espeak), без сети
+
+    Каждая фраза синтезируется в отдельном процессе с таймаутом, как у espeak: зависший
+    runAndWait() не блокирует очередь синтеза.
+    """
+
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self, voice=None, rate=None, timeout=10.0):
+        import pyttsx3  # Только проверка наличия библиотеки: синтез идёт в отдельном процессе
+        self.voice = voice
+        self.rate = rate
+        self.timeout = timeout
+
+    def synthesize(self, text, path):
+        try:
+            subprocess.run([sys.executable, "-c", _PYTTSX3_SCRIPT, text, path, self.voice or "", str(self.rate or "")],
+                           check=True, timeout=self.timeout, capture_output=True)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"pyttsx3 не уложился в {self.timeout} с")
+        except subprocess.CalledProcessError as e:
+            lines = e.stderr.decode(errors='replace').strip().splitlines()
+            raise RuntimeError(f"pyttsx3: {lines[-1] if lines else f'код выхода {e.returncode}'}")
+
+    def cache_key(self):
+        return f"{self.name}-{self.voice}"
+
+
+class EspeakEngine(TTSEngine):
+    """Локальный синтез через espeak-ng / espeak (отдельный процесс с таймаутом), без сети"""
+
+    name = "espeak"
+    extension = "wav"
+
+    def __init__(self, voice="ru", timeout=10.0, command=None):
+        self.voice = voice
+        self.timeout = timeout
+        self.command = command or shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.command:
+            raise RuntimeError("espeak-ng/espeak не найден")
+
+    def synthesize(self, text, path):
+        subprocess.run([self.command, "-v", self.voice, "-w", path, text],
+                       check=True, timeout=self.timeout, capture_output=True)
+
+    def cache_key(self):
+        return f"{self.name}-{self.voice}"
+
+
+class SilentEngine(TTSEngine):
+    """Без голоса: оповещения приходят без аудио"""
+
+    name = "silent"
+
+    def synthesize(self, text, path):
+        return None
+
+
+ENGINES = {
+    "gtts": GTTSEngine,
+    "pyttsx3": Pyttsx3Engine,
+    "espeak": EspeakEngine,
+    "silent": SilentEngine,
+}
+
+
+def create_engine(kind="gtts", **params):
+    """Движок синтеза по имени: "gtts", "pyttsx3", "espeak" или "silent"
+
+    Если движок недоступен (нет библиотеки или программы), оповещения работают без голоса.
+    """
+    if kind not in ENGINES:
+        raise ValueError(f"Неизвестный движок синтеза речи: {kind}")
+    try:
+        return ENGINES[kind](**params)
+    except Exception as e:
+        print(f"⚠️ Движок синтеза речи '{kind}' недоступен ({e}), голосовые оповещения отключены")
+        return SilentEngine()
+
+
+class VoiceCache:
+    """Кеш голосовых фраз на диске и фоновая очередь синтеза
+
+    Текст оповещения зависит только от имени, поэтому фраза синтезируется один раз и хранится
+    в directory под именем из хеша текста. Синтез идёт в фоновом потоке из ограниченной очереди:
+    оповещение ждёт голос не дольше заданного времени и не зависит от доступности сервиса.
+    Фразы для известных лиц генерируются заранее (pregenerate) — при запуске и добавлении лица.
+    """
+
+    def __init__(self, directory, engine, queue_size=64, workers=1):
+        self.directory = directory
+        self.engine = engine
+        self.synthesized = 0
+        self.failed = 0
+        self.dropped = 0  # Запросы, не поместившиеся в очередь
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}  # Имя файла → Future ещё не синтезированной фразы
+        self._lock = threading.Lock()
+        self.workers = workers
+        self._started = False  # Потоки синтеза запускаются при первом запросе
+
+    def filename(self, text):
+        digest = hashlib.sha1(f"{self.engine.cache_key()}\n{text}".encode("utf-8")).hexdigest()[:20]
+        return f"voice_{digest}.{self.engine.extension}"
+
+    def get(self, text):
+        """Имя готового файла фразы или None (без синтеза)"""
+        filename = self.filename(text)
+        return filename if os.path.exists(os.path.join(self.directory, filename)) else None
+
+    def request(self, text, block=False):
+        """Future с именем файла фразы (None — синтез не удался или очередь переполнена)"""
+        filename = self.filename(text)
+        future = Future()
+        if isinstance(self.engine, SilentEngine):
+            future.set_result(None)
+            return future
+        if os.path.exists(os.path.join(self.directory, filename)):
+            future.set_result(filename)
+            return future
+        with self._lock:
+            if filename in self._pending:
+                return self._pending[filename]
+            self._pending[filename] = future
+            if not self._started:
+                self._started = True
+                for i in range(self.workers):
+                    threading.Thread(target=self._run, name=f"tts-{i}", daemon=True).start()
+        try:
+            self._queue.put((text, filename, future), block=block)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(filename, None)
+                self.dropped += 1
+            future.set_result(None)
+        return future
+
+    def voice(self, text, timeout=2.0):
+        """Имя файла фразы, если она готова или успела синтезироваться за timeout, иначе None"""
+        future = self.request(text)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None  # Фраза досинтезируется в фоне и пригодится следующему оповещению
+
+    def pregenerate(self, texts):
+        """Фоновая генерация фраз заранее (без потерь при заполненной очереди); готовые фразы пропускаются"""
+        texts = [text for text in dict.fromkeys(texts) if self.get(text) is None]
+        if not texts or isinstance(self.engine, SilentEngine):
+            return
+
+        def run():
+            for text in texts:
+                self.request(text, block=True)
+
+        threading.Thread(target=run, name="tts-pregenerate", daemon=True).start()
+
+    def _run(self):
+        while True:
+            text, filename, future = self._queue.get()
+            path = os.path.join(self.directory, filename)
+            tmp_path = f"{path}.tmp.{self.engine.extension}"
+            try:
+                self.engine.synthesize(text, tmp_path)
+                os.replace(tmp_path, path)
+                self.synthesized += 1
+                result = filename
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Ошибка синтеза речи: {e}")
+                result = None
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            with self._lock:
+                self._pending.pop(filename, None)
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'engine': self.engine.name,
+            'queue': self._queue.qsize(),
+            'synthesized': self.synthesized,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }